@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+import sys
+import time
+
+from wwi_warrants_pipeline import jsonl_codec
+from wwi_warrants_pipeline.jsonl_codec import decode_page, dumps, loads
+
+# ----------------------------
+# Per-record decode/encode cost: stdlib json vs jsonl_codec
+# ----------------------------
+#
+# Usage: python bench_codec.py [path_to_jsonl] [repeats]
+# Times the JSON work each stage does per record, with no I/O beyond reading
+# the corpus into memory once.
+
+path = sys.argv[1] if len(sys.argv) > 1 else "data/individual_narratives.jsonl"
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+with open(path, "rb") as f:
+    lines = [l for l in f if l.strip()]
+
+PEOPLE_PER_PAGE = 2  # Most warrant pages hold two individuals
+FIELDNAMES = ['id', 'name', 'source_file', 'chronology', 'raw_json_input', 'text_block_index']
+
+
+def per_record_us(fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / len(lines) * 1e6
+
+
+# ---- json_combination: full decode, add source_file, full encode ----
+
+def combination_stdlib():
+    for line in lines:
+        record = json.loads(line)
+        record["source_file"] = "output_x.jsonl"
+        json.dumps(record, ensure_ascii=False)
+
+def combination_codec():
+    for line in lines:
+        record = loads(line)
+        record["source_file"] = "output_x.jsonl"
+        dumps(record)
+
+
+# ---- segmentation / index build: only text, id and Source-File ----
+
+def segmentation_stdlib():
+    for line in lines:
+        record = json.loads(line)
+        record.get("id"), record.get("text", ""), record.get("metadata", {}).get("Source-File", "Unknown")
+
+def segmentation_codec():
+    for line in lines:
+        page = decode_page(line)
+        page.id, page.text, page.source_file
+
+
+# ---- extraction output: CSV row per person with raw_json_input ----
+
+def extraction_stdlib():
+    writer = csv.DictWriter(io.StringIO(), fieldnames=FIELDNAMES)
+    for line in lines:
+        source_data = json.loads(line)
+        for k in range(PEOPLE_PER_PAGE):
+            writer.writerow({
+                'id': 'x', 'name': 'x', 'chronology': '',
+                'source_file': source_data.get('metadata', {}).get('Source-File', 'Unknown'),
+                'raw_json_input': json.dumps(source_data),
+                'text_block_index': k,
+            })
+
+def extraction_codec():
+    writer = csv.DictWriter(io.StringIO(), fieldnames=FIELDNAMES)
+    for line in lines:
+        page = decode_page(line)
+        for k in range(PEOPLE_PER_PAGE):
+            writer.writerow({
+                'id': 'x', 'name': 'x', 'chronology': '',
+                'source_file': page.source_file,
+                'raw_json_input': page.raw,
+                'text_block_index': k,
+            })
+
+
+if __name__ == "__main__":
+    print(f"{len(lines)} records from {path}, codec backend: {jsonl_codec.BACKEND}, best of {repeats}")
+    print(f"{'stage':<14}{'stdlib us/rec':>15}{'codec us/rec':>15}{'speedup':>10}")
+    for stage, std_fn, codec_fn in (
+        ("combination", combination_stdlib, combination_codec),
+        ("segmentation", segmentation_stdlib, segmentation_codec),
+        ("extraction", extraction_stdlib, extraction_codec),
+    ):
+        std_us = per_record_us(std_fn)
+        codec_us = per_record_us(codec_fn)
+        print(f"{stage:<14}{std_us:>15.1f}{codec_us:>15.1f}{std_us / codec_us:>9.1f}x")
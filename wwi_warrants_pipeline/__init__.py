@@ -0,0 +1,34 @@
+"""
+Pipeline for turning the RG 60 arrest warrant scans into an analysis-ready dataset.
+
+Importing the package (or any module in it) does no work: stages run only when
+called, and the Gemini SDK is loaded by extract.init_client(). The names below
+are resolved on first access, so `from wwi_warrants_pipeline import JsonlIndex`
+does not pull in the rest of the pipeline.
+"""
+
+__version__ = "0.1.0"
+
+_LAZY = {
+    "open_text": "compressed_io",
+    "Page": "jsonl_codec",
+    "decode_page": "jsonl_codec",
+    "JsonlIndex": "jsonl_index",
+    "build_index": "jsonl_index",
+    "combine": "combine",
+    "find_near_duplicates": "dedupe",
+    "segment_people_from_jsonl": "segmentation",
+    "resolve_results": "cross_references",
+    "WorkQueue": "work_queue",
+}
+
+__all__ = ["__version__", *_LAZY]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        value = getattr(import_module(f".{_LAZY[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
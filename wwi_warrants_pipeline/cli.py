@@ -0,0 +1,62 @@
+import sys
+from typing import List, Optional
+
+# ----------------------------
+# `wwi-warrants <command> ...` entry point
+# ----------------------------
+#
+# Only this table is loaded to print the command list; each command's module
+# (and the SDKs it needs) is imported when that command runs, and it parses
+# its own arguments. This keeps `--help` and worker start-up fast.
+
+COMMANDS = {
+    # name: (module, summary)
+    "split": ("split", "Split volume PDFs into single-page PDFs"),
+    "ocr": ("ocr", "Run the page PDFs through hosted olmOCR"),
+    "combine": ("combine", "Combine olmOCR JSONL shards into one sorted corpus"),
+    "segment": ("segmentation", "Regex split of pages into per-person blocks"),
+    "extract": ("extract", "Extract people from the pages with Gemini"),
+    "xref": ("cross_references", "Resolve 'See page N' cross-references"),
+    "queue": ("work_queue", "Manage the multi-worker extraction queue"),
+    "dedupe": ("dedupe", "Find near-duplicate pages for extraction to skip"),
+    "index": ("jsonl_index", "Build or query a corpus's byte-offset index"),
+    "compress": ("compressed_io", "Convert a JSONL/CSV file to or from .gz/.zst"),
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = [
+        "usage: wwi-warrants <command> [options]",
+        "",
+        "RG 60 arrest warrant processing pipeline.",
+        "",
+        "commands:",
+    ]
+    lines += [f"  {name:<{width}}  {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", "Run `wwi-warrants <command> --help` for a command's options."]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    if argv[0] == "--version":
+        from . import __version__
+        print(__version__)
+        return
+
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        sys.exit(f"\nwwi-warrants: unknown command '{command}'")
+
+    from importlib import import_module
+    module = import_module(f".{COMMANDS[command][0]}", __package__)
+    module.main(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+from pathlib import Path
+import re
+from typing import List, Optional
+
+from .compressed_io import open_binary_lines, open_text
+from .jsonl_codec import dumps, loads
+from .jsonl_index import build_index
+
+DEFAULT_INPUT_DIR = "data/json"
+DEFAULT_OUTPUT_FILE = "data/combined.jsonl"  # Use combined.jsonl.zst / .gz to write it compressed
+
+# ---- Sort by metadata["Source-File"] ----
+PAGE_RE = re.compile(r"page_(\d+)", re.IGNORECASE)
+
+def source_file_sort_key(r):
+    sf = r.get("metadata", {}).get("Source-File", "")
+
+    m = PAGE_RE.search(sf)
+    page = int(m.group(1)) if m else -1
+
+    # remove page suffix for volume-level grouping
+    volume = PAGE_RE.sub("", sf).strip()
+
+    return (volume, page)
+
+
+def combine(input_dir=DEFAULT_INPUT_DIR, output_file=DEFAULT_OUTPUT_FILE) -> int:
+    """
+    Combines the olmOCR output shards in input_dir into one JSONL sorted by
+    volume and page, indexes it, and returns the number of records written.
+    """
+    input_dir = Path(input_dir)
+    records = []
+
+    # ---- Read all records ----
+    # olmOCR shards may be plain or compressed (.jsonl.gz / .jsonl.zst)
+    shard_paths = sorted(
+        p for pattern in ("*.jsonl", "*.jsonl.gz", "*.jsonl.zst") for p in input_dir.glob(pattern)
+    )
+    for jsonl_path in shard_paths:
+        for line in open_binary_lines(jsonl_path):
+            if not line.strip():
+                continue
+            record = loads(line)
+
+            # keep original jsonl filename if desired
+            record["source_file"] = jsonl_path.name
+
+            records.append(record)
+
+    records.sort(key=source_file_sort_key)
+
+    # ---- Write combined, sorted JSONL ----
+    with open_text(output_file, "w") as out_f:
+        for record in records:
+            out_f.write(dumps(record) + "\n")
+
+    # ---- Index the combined file for random access (see jsonl_index.py) ----
+    build_index(output_file)
+    return len(records)
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(prog="wwi-warrants combine", description="Combine olmOCR JSONL shards into one sorted corpus.")
+    ap.add_argument("--input-dir", default=DEFAULT_INPUT_DIR)
+    ap.add_argument("--output", default=DEFAULT_OUTPUT_FILE)
+    args = ap.parse_args(argv)
+
+    count = combine(args.input_dir, args.output)
+    print(f"Combined {count} records into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import gzip
+import io
+import os
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+# ----------------------------
+# Transparent .gz / .zst support for every JSONL and CSV the pipeline touches
+# ----------------------------
+#
+# open_text(path, mode) picks plain, gzip or zstd from the file extension and
+# streams in both directions, so stages do not change beyond the open call.
+#
+# Writers emit independent frames (a gzip member / zstd frame) every
+# FRAME_BYTES of uncompressed text, always cut at a line boundary. Each frame
+# decompresses on its own, so jsonl_index can record where each frame starts
+# and fetch a single record by decompressing only its frame, and parallel
+# readers can start at any frame. Appending (resumed runs) just adds frames.
+# The standard tools (gunzip, zstd -d, zcat) read these files as usual.
+#
+# flush() does not end the frame: it pushes the compressed data written so far
+# to disk with a sync flush (zlib Z_SYNC_FLUSH / zstd FLUSH_BLOCK), which keeps
+# the compression window, so flushing after every row costs a few bytes per
+# row instead of a new frame. A writer killed mid-frame leaves that frame
+# unterminated; the next append repairs it before adding frames.
+#
+# zstd needs the optional `zstandard` package; gzip uses the standard library.
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FRAME_BYTES = 1 << 20  # ~1 MB of text per frame: good ratio, cheap random access
+READ_CHUNK = 1 << 16
+
+
+def compression_for(path) -> Optional[str]:
+    name = str(path).lower()
+    if name.endswith(".zst") or name.endswith(".zstd"):
+        return "zstd"
+    if name.endswith(".gz"):
+        return "gzip"
+    return None
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise ImportError("Reading/writing .zst files needs the 'zstandard' package (pip install zstandard).")
+
+
+def compress_frame(kind: str, data: bytes, level: Optional[int] = None) -> bytes:
+    if kind == "gzip":
+        return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    _require_zstd()
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _compressor(kind: str, level: Optional[int] = None):
+    """
+    Streaming compressor for one frame: gzip member (wbits 16+) or zstd frame.
+    """
+    if kind == "gzip":
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    _require_zstd()
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+
+
+def _sync_flush_mode(kind: str):
+    return zlib.Z_SYNC_FLUSH if kind == "gzip" else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+
+def _decompressor(kind: str):
+    if kind == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    _require_zstd()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def decompress_frame(kind: str, data: bytes) -> bytes:
+    """
+    Decompresses exactly one frame/member.
+    """
+    return _decompressor(kind).decompress(data)
+
+
+def iter_frames(path, kind: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Walks a compressed file frame by frame, yielding
+    (compressed_offset, compressed_length, decompressed_bytes).
+    Only one frame is held in memory at a time.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        pending = b""
+        while True:
+            if not pending:
+                pending = f.read(READ_CHUNK)
+                if not pending:
+                    return
+            d = _decompressor(kind)
+            out = []
+            consumed = 0
+            while True:
+                out.append(d.decompress(pending))
+                if d.eof:
+                    rest = d.unused_data
+                    consumed += len(pending) - len(rest)
+                    pending = rest
+                    break
+                consumed += len(pending)
+                pending = f.read(READ_CHUNK)
+                if not pending:
+                    raise EOFError(f"{path}: compressed stream ends inside a frame at byte {offset + consumed}")
+            yield offset, consumed, b"".join(out)
+            offset += consumed
+
+
+def recover_tail(path, kind: str) -> bool:
+    """
+    Closes off an unterminated last frame (left by a writer that was killed
+    between flushes) so frames can be appended after it. The frame's complete
+    lines are re-written as a closed frame; a trailing partial line is dropped.
+    Returns True if the file was repaired.
+    """
+    end = 0
+    try:
+        for offset, length, _ in iter_frames(path, kind):
+            end = offset + length
+        return False
+    except EOFError:
+        pass
+    with open(path, "r+b") as f:
+        f.seek(end)
+        tail = f.read()
+        try:
+            data = _decompressor(kind).decompress(tail)
+        except Exception:
+            # Corrupt inside the cut-off block: keep nothing from this frame
+            data = b""
+        data = data[:data.rfind(b"\n") + 1]
+        f.seek(end)
+        f.truncate()
+        if data:
+            f.write(compress_frame(kind, data))
+    print(f"  Repaired unterminated last frame of {path} ({len(data):,} bytes kept)")
+    return True
+
+
+class FramedWriter(io.TextIOBase):
+    """
+    Text writer that compresses in independent, line-aligned frames.
+    """
+
+    def __init__(self, path, kind: str, mode: str = "w", encoding: str = "utf-8", level: Optional[int] = None):
+        if kind == "zstd":
+            _require_zstd()
+        self.kind = kind
+        self._encoding = encoding
+        self.level = level
+        appending = mode.startswith("a")
+        if appending and os.path.exists(path) and os.path.getsize(path) > 0:
+            recover_tail(path, kind)
+        self._fh = open(path, "ab" if appending else "wb")
+        self._comp = None  # compressor of the open frame, if any
+        self._frame_size = 0  # uncompressed bytes in the open frame
+        self._partial = b""  # text after the last newline, not yet in a frame
+
+    @property
+    def encoding(self) -> str:
+        return self._encoding
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        data = self._partial + s.encode(self._encoding)
+        # Only whole lines go into a frame, so a frame can end after any of them
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:]
+        if cut:
+            self._feed(data[:cut])
+            if self._frame_size >= FRAME_BYTES:
+                self._end_frame()
+        return len(s)
+
+    def _feed(self, data: bytes):
+        if self._comp is None:
+            self._comp = _compressor(self.kind, self.level)
+        self._fh.write(self._comp.compress(data))
+        self._frame_size += len(data)
+
+    def _end_frame(self):
+        if self._comp is not None:
+            self._fh.write(self._comp.flush())
+            self._comp = None
+            self._frame_size = 0
+
+    def flush(self):
+        """
+        Writes everything so far to disk without ending the frame (sync flush),
+        so the extractors can flush after every row at little cost in ratio.
+        """
+        if self._fh.closed:
+            return
+        if self._partial:
+            self._feed(self._partial)
+            self._partial = b""
+        if self._comp is not None:
+            self._fh.write(self._comp.flush(_sync_flush_mode(self.kind)))
+        self._fh.flush()
+
+    def close(self):
+        if not self.closed:
+            if self._partial:
+                self._feed(self._partial)
+                self._partial = b""
+            self._end_frame()
+            self._fh.close()
+        super().close()
+
+
+def open_text(path, mode: str = "r", encoding: str = "utf-8", newline: Optional[str] = None):
+    """
+    open() for text that also handles .gz and .zst by extension.
+    Modes: "r", "w", "a" (text); pass newline="" for csv as with open().
+    """
+    kind = compression_for(path)
+    if kind is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+
+    if mode.startswith("r"):
+        if kind == "gzip":
+            return gzip.open(path, "rt", encoding=encoding, newline=newline)
+        _require_zstd()
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(raw), encoding=encoding, newline=newline)
+
+    # Lines are written as given (no newline translation), which is also what
+    # csv expects from newline=""
+    return FramedWriter(path, kind, mode=mode, encoding=encoding)
+
+
+def open_binary_lines(path) -> Iterator[bytes]:
+    """
+    Yields raw lines (with trailing newline) of a plain or compressed file.
+    """
+    kind = compression_for(path)
+    if kind is None:
+        with open(path, "rb") as f:
+            yield from f
+        return
+    carry = b""
+    for _, _, data in iter_frames(path, kind):
+        data = carry + data
+        lines = data.split(b"\n")
+        carry = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if carry:
+        yield carry
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants compress", description="Convert a JSONL/CSV file to (or from) framed .gz/.zst.")
+    ap.add_argument("source")
+    ap.add_argument("dest")
+    args = ap.parse_args(argv)
+
+    start = time.time()
+    with open_text(args.source, "r", newline="") as src, open_text(args.dest, "w", newline="") as dst:
+        for line in src:
+            dst.write(line)
+    src_size, dst_size = os.path.getsize(args.source), os.path.getsize(args.dest)
+    print(f"{args.source} ({src_size:,} B) -> {args.dest} ({dst_size:,} B, {src_size / max(dst_size, 1):.1f}x) in {time.time() - start:.1f}s")
+
+
+def _self_check():
+    """
+    Round trips, frame cuts, crash repair and indexed random access on temp files.
+    Run with `python -m wwi_warrants_pipeline.compressed_io --self-check`.
+    """
+    import json
+    import shutil
+    import tempfile
+    from .jsonl_index import JsonlIndex
+
+    global FRAME_BYTES
+
+    lines = [json.dumps({"id": f"p{i}", "text": f"Warrant {i} \u00e9 " + "x" * (i % 7)}) + "\n" for i in range(300)]
+    kinds = ["gzip"] + (["zstd"] if zstandard is not None else [])
+    saved = FRAME_BYTES
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for kind in kinds:
+                path = os.path.join(tmp, "pages.jsonl." + ("gz" if kind == "gzip" else "zst"))
+
+                # Flushing after every line keeps a single frame
+                FRAME_BYTES = saved
+                with open_text(path, "w") as f:
+                    for line in lines:
+                        f.write(line)
+                        f.flush()
+                assert len(list(iter_frames(path, kind))) == 1
+                with open_text(path, "r", newline="") as f:
+                    assert f.readlines() == lines
+
+                # Small frames are cut at line boundaries and each decompresses on its own
+                FRAME_BYTES = 1000
+                with open_text(path, "w") as f:
+                    f.writelines(lines)
+                frames = list(iter_frames(path, kind))
+                assert len(frames) > 5 and all(data.endswith(b"\n") for _, _, data in frames)
+                with open(path, "rb") as f:
+                    blob = f.read()
+                for offset, length, data in frames:
+                    assert decompress_frame(kind, blob[offset:offset + length]) == data
+                assert b"".join(open_binary_lines(path)) == "".join(lines).encode("utf-8")
+
+                # Random access decompresses only the frame holding the record
+                with JsonlIndex(path, rebuild=True) as corpus:
+                    assert len(corpus.frames) == len(frames)
+                    for i in (0, 137, 299):
+                        assert corpus.get_page(f"p{i}").raw == lines[i].rstrip("\n")
+
+                # Killed after a flush: copy the file before close() ends the frame.
+                # The next append closes off that frame (dropping the partial line) and continues
+                crashed = path + ".crashed" + path[path.rindex("."):]
+                with open_text(path, "w") as f:
+                    f.writelines(lines[:250])
+                    f.write(lines[250][:10])
+                    f.flush()
+                    shutil.copyfile(path, crashed)
+                try:
+                    list(iter_frames(crashed, kind))
+                    raise AssertionError("last frame should be unterminated")
+                except EOFError:
+                    pass
+                with open_text(crashed, "a") as f:
+                    f.writelines(lines[250:])
+                with open_text(crashed, "r", newline="") as f:
+                    assert f.readlines() == lines
+                assert not recover_tail(crashed, kind)
+    finally:
+        FRAME_BYTES = saved
+
+    print(f"compressed_io self-check passed ({', '.join(kinds)})")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--self-check"]:
+        _self_check()
+    else:
+        main()
@@ -0,0 +1,441 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+# ----------------------------
+# Provider-side context caching for the Gemini extractors
+# ----------------------------
+#
+# Every batch call resends the same instruction text, the ExtractionResponse
+# schema and any few-shot example pages. With explicit caching that fixed
+# prefix is uploaded once per run and each batch only sends its own pages
+# plus the cache name. If the backend refuses to cache (unsupported model,
+# prefix below the minimum token count, no caching on the key) we fall back
+# to sending the prefix inline so output does not depend on the cache. Other
+# create errors (timeouts, 5xx) only send that one request inline; the next
+# request tries to create the cache again.
+#
+# The provider only caches a prefix above a per-model minimum token count
+# (the create error reports it as min_total_token_count; about 1k tokens for
+# the Flash models). The system prompt and schema alone are a few hundred
+# tokens, so caching only takes effect once a few-shot file is supplied.
+# That file is JSONL, one worked example per line:
+#     {"text": "<input exactly as the extractor sends it>", "people": [...]}
+# where "people" is the expected output in the extractor's own schema. For
+# `wwi-warrants extract` the text is a "BATCH DATA:" prompt (build_batch_prompt)
+# and each person carries its text_block_index; two or three batches of real
+# pages clear the minimum. extract_single takes "LOG TEXT:" pages instead, so
+# it reads a file of its own.
+
+
+def load_few_shot_examples(path: str) -> List[dict]:
+    """
+    Reads few-shot examples from a JSONL file, one {"text": ..., "people": [...]}
+    object per line. "text" is the page (or batch) input and "people" is the
+    expected extraction. Returns [] if the file does not exist.
+    """
+    examples = []
+    if not path or not os.path.exists(path):
+        return examples
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            examples.append(json.loads(line))
+    return examples
+
+
+def few_shot_contents(examples: List[dict]) -> List[dict]:
+    """
+    Renders examples as alternating user/model turns.
+    """
+    contents = []
+    for ex in examples:
+        contents.append({"role": "user", "parts": [{"text": ex.get("text", "")}]})
+        contents.append({"role": "model", "parts": [{"text": json.dumps({"people": ex.get("people", [])})}]})
+    return contents
+
+
+def schema_instruction(system_prompt: str, response_model) -> str:
+    """
+    Appends the JSON schema of response_model to the system prompt. Meant for
+    PromptCache's cache_instruction only: requests already carry the schema as
+    response_schema, so it is not repeated in the inline fallback.
+    """
+    return (
+        f"{system_prompt}\n\n"
+        "Return JSON matching this schema:\n"
+        f"{json.dumps(response_model.model_json_schema())}"
+    )
+
+
+class LocalCacheBackend:
+    """
+    In-process stand-in for `client.caches`. Mirrors create/get/delete and
+    honours the TTL, so the cache/refresh/fallback paths can be exercised
+    without network access or an API key.
+    """
+
+    def __init__(self, supported: bool = True):
+        self.supported = supported
+        self.entries = {}
+        self.created = 0
+
+    def create(self, model: str, config: dict):
+        if not self.supported:
+            raise RuntimeError(f"Model {model} does not support explicit caching")
+        self.created += 1
+        ttl = int(str(config.get("ttl", "3600s")).rstrip("s"))
+        name = f"cachedContents/local-{self.created}"
+        entry = _LocalCachedContent(
+            name=name,
+            model=model,
+            expire_time=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            config=config,
+        )
+        self.entries[name] = entry
+        return entry
+
+    def get(self, name: str):
+        entry = self.entries.get(name)
+        if entry is None or entry.expire_time <= datetime.now(timezone.utc):
+            self.entries.pop(name, None)
+            raise LookupError(f"CachedContent not found (or expired): {name}")
+        return entry
+
+    def delete(self, name: str):
+        self.entries.pop(name, None)
+
+
+class _LocalCachedContent:
+    def __init__(self, name, model, expire_time, config):
+        self.name = name
+        self.model = model
+        self.expire_time = expire_time
+        self.config = config
+
+
+class PromptCache:
+    """
+    Holds the fixed prompt prefix (system instruction + few-shot turns) for one run.
+
+    `request_config` and `request_contents` return what to send with each batch:
+    either a reference to the provider cache or the full prefix inline. The cache
+    entry is created lazily on first use, refreshed shortly before its TTL runs
+    out, and recreated if the provider reports it missing.
+
+    `cache_instruction` (default: system_instruction) is what the cache entry is
+    created with; it may carry extra text such as the schema that is only worth
+    sending at the cached rate. Inline requests use system_instruction.
+    """
+
+    def __init__(
+        self,
+        caches,
+        model: str,
+        system_instruction: str,
+        examples: Optional[List[dict]] = None,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 60,
+        enabled: bool = True,
+        cache_instruction: Optional[str] = None,
+    ):
+        self.caches = caches
+        self.model = model
+        self.system_instruction = system_instruction
+        self.cache_instruction = cache_instruction or system_instruction
+        self.prefix_contents = few_shot_contents(examples or [])
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self.enabled = enabled
+        self.cache_name = None
+        self.expire_time = None
+
+        # Running totals for the end-of-run summary
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def _create(self):
+        cache = self.caches.create(
+            model=self.model,
+            config={
+                "display_name": "wwi-warrants-extraction-prefix",
+                "system_instruction": self.cache_instruction,
+                "contents": self.prefix_contents or None,
+                "ttl": f"{self.ttl_seconds}s",
+            },
+        )
+        self.cache_name = cache.name
+        self.expire_time = cache.expire_time
+        print(f"  Created context cache {self.cache_name} (TTL {self.ttl_seconds}s)")
+
+    def active_cache(self) -> Optional[str]:
+        """
+        Returns the cache name to reference, creating or refreshing it as needed.
+        Returns None (inline mode) if caching is disabled, unsupported for this
+        model/prefix, or the create call failed this time.
+        """
+        if not self.enabled:
+            return None
+        now = datetime.now(timezone.utc)
+        if self.cache_name is None or (self.expire_time and self.expire_time - self.refresh_margin <= now):
+            try:
+                self._create()
+            except Exception as e:
+                if is_caching_unsupported(e):
+                    print(f"  !! Context caching unavailable, sending prompt inline: {e}")
+                    self.enabled = False
+                elif self.cache_name and self.expire_time and self.expire_time > now:
+                    # The refresh failed but the current entry has not expired yet
+                    print(f"  !! Could not refresh context cache, keeping {self.cache_name}: {e}")
+                    return self.cache_name
+                else:
+                    print(f"  !! Could not create context cache, sending this request inline: {e}")
+                self.invalidate()
+                return None
+        return self.cache_name
+
+    def invalidate(self):
+        """
+        Forgets the current cache entry so the next request recreates it.
+        """
+        self.cache_name = None
+        self.expire_time = None
+
+    def request_config(self, base_config: dict) -> dict:
+        config = dict(base_config)
+        cache_name = self.active_cache()
+        if cache_name:
+            config["cached_content"] = cache_name
+        else:
+            config["system_instruction"] = self.system_instruction
+        return config
+
+    def request_contents(self, prompt: str, config: dict) -> list:
+        user_turn = {"role": "user", "parts": [{"text": prompt}]}
+        if config.get("cached_content"):
+            return [user_turn]
+        return self.prefix_contents + [user_turn]
+
+    def generate(self, models, base_config: dict, prompt: str):
+        """
+        Calls models.generate_content with the cached (or inline) prefix. If the
+        provider no longer has the cache entry, it is recreated and the call retried once.
+        """
+        config = self.request_config(base_config)
+        try:
+            response = models.generate_content(
+                model=self.model,
+                contents=self.request_contents(prompt, config),
+                config=config,
+            )
+        except Exception as e:
+            if not config.get("cached_content") or not is_cache_miss(e):
+                raise
+            print(f"  Context cache {config['cached_content']} expired, refreshing...")
+            self.invalidate()
+            config = self.request_config(base_config)
+            response = models.generate_content(
+                model=self.model,
+                contents=self.request_contents(prompt, config),
+                config=config,
+            )
+        self.record_usage(response)
+        return response
+
+    def generate_stream(self, models, base_config: dict, prompt: str):
+        """
+        Streaming counterpart of `generate`: yields response chunks from
+        models.generate_content_stream. A cache miss is detected on the first
+        chunk, before anything has been yielded, so the retry is transparent.
+        """
+        config = self.request_config(base_config)
+        try:
+            stream = models.generate_content_stream(
+                model=self.model,
+                contents=self.request_contents(prompt, config),
+                config=config,
+            )
+            first = next(stream, None)
+        except Exception as e:
+            if not config.get("cached_content") or not is_cache_miss(e):
+                raise
+            print(f"  Context cache {config['cached_content']} expired, refreshing...")
+            self.invalidate()
+            config = self.request_config(base_config)
+            stream = models.generate_content_stream(
+                model=self.model,
+                contents=self.request_contents(prompt, config),
+                config=config,
+            )
+            first = next(stream, None)
+
+        last = first
+        if first is not None:
+            yield first
+            for chunk in stream:
+                last = chunk
+                yield chunk
+        # Usage totals arrive on the final chunk
+        self.record_usage(last)
+
+    def record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        self.requests += 1
+        if usage is None:
+            return
+        self.prompt_tokens += usage.prompt_token_count or 0
+        self.cached_tokens += usage.cached_content_token_count or 0
+
+    def summary(self) -> str:
+        mode = f"cache {self.cache_name}" if self.cache_name else "inline prompts"
+        return (
+            f"{self.requests} requests using {mode}: "
+            f"{self.prompt_tokens} input tokens, {self.cached_tokens} served from cache"
+        )
+
+    def close(self):
+        """
+        Deletes the cache entry so it stops accruing storage before its TTL.
+        """
+        if self.cache_name:
+            try:
+                self.caches.delete(name=self.cache_name)
+            except Exception as e:
+                print(f"  !! Could not delete context cache {self.cache_name}: {e}")
+            self.cache_name = None
+
+
+def is_caching_unsupported(error: Exception) -> bool:
+    """
+    True if the create error is final for this run: the model or key does not
+    support explicit caching, or the prefix is below the minimum cache size.
+    """
+    message = str(error).lower()
+    return (
+        "not support" in message
+        or "unsupported" in message
+        or "too small" in message
+        or "min_total_token_count" in message
+        or "minimum" in message
+    )
+
+
+def is_cache_miss(error: Exception) -> bool:
+    """
+    True if the error means the referenced cache entry is gone (expired or deleted).
+    """
+    message = str(error).lower()
+    return ("cachedcontent" in message or "cached content" in message or "cache" in message) and (
+        "not found" in message or "expired" in message or "404" in message or "permission" in message
+    )
+
+
+# ----------------------------
+# Local self-check
+# ----------------------------
+
+if __name__ == "__main__":
+    from pydantic import BaseModel
+
+    class _Response(BaseModel):
+        people: List[str]
+
+    class _Usage:
+        def __init__(self, prompt, cached):
+            self.prompt_token_count = prompt
+            self.cached_content_token_count = cached
+
+    class _Models:
+        """
+        Fake `client.models`: resolves cached_content through the backend (so a
+        missing entry raises like the API does) and records every request config.
+        """
+
+        def __init__(self, caches):
+            self.caches = caches
+            self.configs = []
+
+        def generate_content(self, model, contents, config):
+            self.configs.append(config)
+            name = config.get("cached_content")
+            cached = len(self.caches.get(name).config["system_instruction"]) // 4 if name else 0
+            prefix = 0 if name else len(config["system_instruction"]) // 4
+            response = type("R", (), {})()
+            response.text = '{"people": []}'
+            response.usage_metadata = _Usage(prefix + cached + len(contents[-1]["parts"][0]["text"]) // 4, cached)
+            return response
+
+    class _FlakyBackend(LocalCacheBackend):
+        """
+        Fails the first `failures` create calls with a transient error.
+        """
+
+        def __init__(self, failures):
+            super().__init__()
+            self.failures = failures
+
+        def create(self, model, config):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("503 UNAVAILABLE: deadline exceeded")
+            return super().create(model, config)
+
+    base = {"response_mime_type": "application/json", "response_schema": _Response.model_json_schema()}
+    examples = [{"text": "BATCH DATA: example", "people": ["Carl Winterlin"]}]
+
+    def new_cache(backend, **kwargs):
+        return PromptCache(
+            backend, "local-model", "Extract people.", examples,
+            cache_instruction=schema_instruction("Extract people.", _Response), **kwargs,
+        )
+
+    # Created once, then referenced by every request; the schema text is in the cache entry
+    backend = LocalCacheBackend()
+    models = _Models(backend)
+    cache = new_cache(backend, ttl_seconds=2, refresh_margin_seconds=0)
+    for _ in range(3):
+        cache.generate(models, base, "BATCH DATA: ...")
+    assert backend.created == 1, backend.created
+    assert all(c.get("cached_content") == "cachedContents/local-1" for c in models.configs)
+    assert all("system_instruction" not in c for c in models.configs)
+    assert "Return JSON matching this schema" in backend.entries["cachedContents/local-1"].config["system_instruction"]
+    assert cache.cached_tokens > 0
+
+    # Past the TTL the next request creates a fresh entry
+    time.sleep(2.1)
+    cache.generate(models, base, "BATCH DATA: ...")
+    assert backend.created == 2 and models.configs[-1]["cached_content"] == "cachedContents/local-2"
+
+    # Provider dropped the entry early: the request hits a miss, recreates and retries once
+    backend.entries.clear()
+    calls = len(models.configs)
+    cache.generate(models, base, "BATCH DATA: ...")
+    assert backend.created == 3 and len(models.configs) == calls + 2
+    assert models.configs[-1]["cached_content"] == "cachedContents/local-3"
+    cache.close()
+    assert not backend.entries
+
+    # Unsupported: inline for the rest of the run, without the schema text
+    backend = LocalCacheBackend(supported=False)
+    models = _Models(backend)
+    fallback = new_cache(backend)
+    fallback.generate(models, base, "BATCH DATA: ...")
+    fallback.generate(models, base, "BATCH DATA: ...")
+    assert not fallback.enabled and fallback.cache_name is None
+    assert all(c["system_instruction"] == "Extract people." for c in models.configs)
+    assert all("cached_content" not in c for c in models.configs)
+
+    # Transient create error: this request goes inline, the next one creates the cache
+    backend = _FlakyBackend(failures=1)
+    models = _Models(backend)
+    flaky = new_cache(backend)
+    flaky.generate(models, base, "BATCH DATA: ...")
+    assert flaky.enabled and "cached_content" not in models.configs[-1]
+    flaky.generate(models, base, "BATCH DATA: ...")
+    assert backend.created == 1 and models.configs[-1]["cached_content"] == "cachedContents/local-1"
+
+    print("context_cache self-check passed")
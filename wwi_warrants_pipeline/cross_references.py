@@ -0,0 +1,348 @@
+import csv
+import os
+import re
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .compressed_io import compression_for, open_text
+from .jsonl_index import JsonlIndex, volume_page
+
+# ----------------------------
+# "See page N" cross-reference resolver
+# ----------------------------
+#
+# Clerks often finished a case on another page: "8/6 paroled. See page 207 -
+# 3rd Pocket". Pages are extracted one batch at a time, so those people end up
+# with final_status "Unknown". This stage makes one pass over the extraction
+# CSV, finds the references in each person's part of their page, looks the
+# target page up through the (volume, page) index of the combined corpus, and
+# attaches the matching text (and any rows already extracted from that page).
+#
+# Docket page numbers do not equal PDF page numbers (name-list pages, skipped
+# scans) and a reference can point into a pocket volume, so candidates are the
+# nearby pages of the same volume, then the same page number in other volumes.
+# The candidate that mentions the person's case/file number (or surname) wins.
+
+REF_RE = re.compile(r"\bsee\s+p(?:age|g)?\.?\s*(\d{1,4})\b([^\n]{0,40})", re.IGNORECASE)
+POCKET_RE = re.compile(r"(\d+)\s*(?:st|nd|rd|th)\.?\s+pocket", re.IGNORECASE)
+VOLUME_RE = re.compile(r"\bvol\.?\s*([ivxlc]+|\d+)\b", re.IGNORECASE)
+DOCKET_RE = re.compile(r"\bdocket\b", re.IGNORECASE)
+
+# Case IDs such as 1084-5837 or 1083-1047-2; the second part is the file number
+CASE_ID_RE = re.compile(r"\b(\d{1,4})[-.](\d{3,5})(?:-\d+)?\b")
+
+SAME_VOLUME_WINDOW = 15
+OTHER_VOLUME_WINDOW = 2
+
+# Only unambiguous outcomes. Printed form lines ("Arrested Released",
+# "Release authorized", "Parole authorized") appear on every later page, so
+# bare "released"/"authorized" are not used.
+STATUS_PATTERNS = [
+    (re.compile(r"\bparoled\b|\bparole (?:granted|notice)\b", re.IGNORECASE), "Paroled"),
+    (re.compile(r"\brelease reported\b|\breleased (?:on|under|unconditionally)\b|\bunconditionally released\b", re.IGNORECASE), "Released"),
+    (re.compile(r"\bto war\b|\bwar camp\b|\binterned\b|\bft\.? oglethorpe? reported\b", re.IGNORECASE), "To War"),
+    (re.compile(r"\binsane\b", re.IGNORECASE), "Insane"),
+    (re.compile(r"\bdeported\b", re.IGNORECASE), "Deported"),
+    (re.compile(r"\bdied\b|\bdeceased\b", re.IGNORECASE), "Died"),
+]
+
+ROMAN = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100}
+
+
+class Reference(NamedTuple):
+    page: int
+    pocket: Optional[int]
+    volume: Optional[int]  # Explicit "Vol. III" in the reference, if any
+    other_docket: bool     # "docket Apr 26", "3rd docket": a docket we cannot map
+    text: str
+
+
+def roman_to_int(s: str) -> int:
+    if s.isdigit():
+        return int(s)
+    total, prev = 0, 0
+    for ch in reversed(s.lower()):
+        val = ROMAN[ch]
+        total = total - val if val < prev else total + val
+        prev = max(prev, val)
+    return total
+
+
+def find_references(text: str) -> List[Reference]:
+    refs = []
+    for m in REF_RE.finditer(text):
+        tail = m.group(2)
+        pocket = POCKET_RE.search(tail)
+        vol = VOLUME_RE.search(tail)
+        refs.append(Reference(
+            page=int(m.group(1)),
+            pocket=int(pocket.group(1)) if pocket else None,
+            volume=roman_to_int(vol.group(1)) if vol else None,
+            other_docket=bool(DOCKET_RE.search(tail)) and not vol,
+            text=m.group(0).strip(),
+        ))
+    return refs
+
+
+def paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def person_terms(person_id: str, name: str) -> Tuple[List[str], List[str]]:
+    """
+    Returns (strong, weak) search terms for a person: case/file numbers from the id,
+    and the surname. File numbers survive when the clerk re-enters a case on a new
+    page with a different docket number, surnames are the fallback.
+    """
+    strong = []
+    for m in CASE_ID_RE.finditer(person_id or ""):
+        strong.extend([m.group(0), m.group(2)])
+    weak = []
+    words = [w.strip(".,") for w in (name or "").split()]
+    words = [w for w in words if len(w) >= 3 and w.lower() != "unknown"]
+    if words:
+        weak.append(words[-1])
+    return strong, weak
+
+
+def match_score(text: str, strong: List[str], weak: List[str]) -> int:
+    lowered = text.lower()
+    if any(re.search(rf"\b{re.escape(t)}\b", text) for t in strong):
+        return 2
+    if any(re.search(rf"\b{re.escape(t.lower())}\b", lowered) for t in weak):
+        return 1
+    return 0
+
+
+def infer_status(text: str) -> Optional[str]:
+    """
+    Last unambiguous outcome mentioned in text, or None.
+    """
+    best_pos, best = -1, None
+    for pattern, status in STATUS_PATTERNS:
+        for m in pattern.finditer(text):
+            if m.start() > best_pos:
+                best_pos, best = m.start(), status
+    return best
+
+
+# ----------------------------
+# Resolution through the (volume, page) index
+# ----------------------------
+
+def volume_with_number(volume: str, number: int) -> str:
+    return re.sub(r"\d+\s*$", str(number), volume)
+
+
+def candidate_pages(corpus: JsonlIndex, source_file: str, ref: Reference):
+    """
+    Yields (source_file_volume, page, distance) in preference order. Same volume
+    near the referenced number first, then the same number in the other volumes.
+    """
+    volume, src_page = volume_page(source_file)
+    home = volume_with_number(volume, ref.volume) if ref.volume else volume
+    seen = {(volume, src_page)}
+    for delta in sorted(range(-SAME_VOLUME_WINDOW, SAME_VOLUME_WINDOW + 1), key=abs):
+        key = (home, ref.page + delta)
+        if key not in seen:
+            seen.add(key)
+            yield home, ref.page + delta, abs(delta)
+    if ref.volume:
+        return
+    for other in corpus.volumes():
+        if other == home:
+            continue
+        for delta in sorted(range(-OTHER_VOLUME_WINDOW, OTHER_VOLUME_WINDOW + 1), key=abs):
+            key = (other, ref.page + delta)
+            if key not in seen:
+                seen.add(key)
+                yield other, ref.page + delta, SAME_VOLUME_WINDOW + 1 + abs(delta)
+
+
+def resolve(corpus: JsonlIndex, source_file: str, ref: Reference, strong: List[str], weak: List[str]):
+    """
+    Returns (target Page, snippet) for the best candidate that mentions the person,
+    or (None, "") if no nearby page does.
+    """
+    if ref.other_docket:
+        return None, ""
+    best = None
+    for volume, page_no, distance in candidate_pages(corpus, source_file, ref):
+        line_no = corpus.index["pages"].get(volume, {}).get(str(page_no))
+        if line_no is None:
+            continue
+        page = corpus.page_at(line_no)
+        if page is None:
+            continue
+        score = match_score(page.text, strong, weak)
+        # A file-number match beats a surname match; then the nearest page wins
+        if score and (best is None or (score, -distance) > (best[0], -best[1])):
+            best = (score, distance, page)
+        if best and best[0] == 2:
+            break
+    if best is None:
+        return None, ""
+    page = best[2]
+    snippet = "\n\n".join(p for p in paragraphs(page.text) if match_score(p, strong, weak))
+    return page, snippet or page.text
+
+
+# ----------------------------
+# Attribution on the source page
+# ----------------------------
+
+def references_by_person(text: str, people: List[dict]) -> Dict[int, List[Reference]]:
+    """
+    Splits a page into paragraphs, assigns each paragraph to the person it names
+    (continuation paragraphs belong to the previous person) and returns
+    {row position: [references in that person's paragraphs]}.
+    """
+    terms = [person_terms(p.get("id", ""), p.get("name", "")) for p in people]
+    out: Dict[int, List[Reference]] = {}
+    owner = 0 if len(people) == 1 else None
+    for para in paragraphs(text):
+        scores = [match_score(para, s, w) for s, w in terms]
+        if scores and max(scores) > 0:
+            owner = scores.index(max(scores))
+        refs = find_references(para)
+        if refs and owner is not None:
+            out.setdefault(owner, []).extend(refs)
+    return out
+
+
+def default_output_path(results_csv: str) -> str:
+    """
+    <stem>_xref<ext> next to the results file, keeping any .gz/.zst suffix:
+    warrant_results.csv -> warrant_results_xref.csv, out.csv.zst -> out_xref.csv.zst.
+    """
+    folder, name = os.path.split(results_csv)
+    compressed = ""
+    if compression_for(name):
+        name, compressed = os.path.splitext(name)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f"{stem}_xref{ext or '.csv'}{compressed}")
+
+
+def resolve_results(results_csv: str, corpus_path: str, output_csv: str):
+    """
+    Adds cross_references / cross_reference_text / cross_reference_events /
+    final_status_source columns to an extraction CSV and fills in final_status
+    for "Unknown" rows from the referenced page.
+    """
+    if os.path.realpath(output_csv) == os.path.realpath(results_csv):
+        raise ValueError(f"Output {output_csv} is the results file itself; choose another --output")
+    csv.field_size_limit(sys.maxsize)
+    with open_text(results_csv, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(reader)
+
+    rows_by_source: Dict[str, List[int]] = {}
+    for pos, row in enumerate(rows):
+        rows_by_source.setdefault(row.get("source_file", ""), []).append(pos)
+
+    for col in ("cross_references", "cross_reference_text", "cross_reference_events", "final_status_source"):
+        if col not in fieldnames:
+            fieldnames.append(col)
+
+    resolved = filled = unresolved = 0
+    with JsonlIndex(corpus_path) as corpus:
+        for source_file, positions in rows_by_source.items():
+            line_no = corpus.index["source_files"].get(source_file)
+            page = corpus.page_at(line_no) if line_no is not None else None
+            people = [rows[p] for p in positions]
+            for p in positions:
+                rows[p]["final_status_source"] = "page" if (rows[p].get("final_status") or "Unknown") != "Unknown" else ""
+            if page is None:
+                continue
+
+            for person_pos, refs in references_by_person(page.text, people).items():
+                row = people[person_pos]
+                strong, weak = person_terms(row.get("id", ""), row.get("name", ""))
+                labels, snippets, events = [], [], []
+                status = None
+                for ref in refs:
+                    target, snippet = resolve(corpus, source_file, ref, strong, weak)
+                    if target is None:
+                        unresolved += 1
+                        labels.append(f"{ref.text} -> unresolved")
+                        continue
+                    resolved += 1
+                    labels.append(f"{ref.text} -> {target.source_file}")
+                    snippets.append(snippet)
+                    # Rows already extracted from the target page for the same person
+                    for t in rows_by_source.get(target.source_file, []):
+                        other = rows[t]
+                        if match_score(f"{other.get('id', '')} {other.get('name', '')}", strong, weak):
+                            if other.get("chronology"):
+                                events.append(other["chronology"])
+                            if (other.get("final_status") or "Unknown") != "Unknown":
+                                status = other["final_status"]
+                    status = status or infer_status(snippet)
+
+                row["cross_references"] = " | ".join(labels)
+                row["cross_reference_text"] = " || ".join(snippets)
+                row["cross_reference_events"] = " | ".join(events)
+                if status and (row.get("final_status") or "Unknown") == "Unknown":
+                    row["final_status"] = status
+                    row["final_status_source"] = "cross_reference"
+                    filled += 1
+
+    with open_text(output_csv, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Resolved {resolved} references ({unresolved} unresolved), filled {filled} Unknown final statuses -> {output_csv}")
+
+
+def list_references(corpus_path: str, output_jsonl: str):
+    """
+    Corpus-only mode (no extraction yet): writes every reference with the page it
+    resolves to, attributing it to the case IDs in the same paragraph run.
+    """
+    from .jsonl_codec import dumps
+
+    count = 0
+    with JsonlIndex(corpus_path) as corpus, open_text(output_jsonl, "w") as out:
+        for _, page in corpus.iter_pages():
+            case_ids: List[str] = []
+            for para in paragraphs(page.text):
+                ids_here = [m.group(0) for m in CASE_ID_RE.finditer(para)]
+                if ids_here:
+                    case_ids = ids_here
+                for ref in find_references(para):
+                    strong, _ = person_terms(" ".join(case_ids), "")
+                    target, snippet = resolve(corpus, page.source_file, ref, strong, [])
+                    out.write(dumps({
+                        "id": page.id,
+                        "source_file": page.source_file,
+                        "case_ids": case_ids,
+                        "reference": ref._asdict(),
+                        "target_source_file": target.source_file if target else None,
+                        "target_text": snippet,
+                    }) + "\n")
+                    count += 1
+    print(f"Wrote {count} references to {output_jsonl}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants xref", description="Resolve 'See page N' references across pages.")
+    ap.add_argument("--corpus", default="./data/individual_narratives.jsonl")
+    ap.add_argument("--results", help="Extraction CSV to augment (e.g. warrant_results_20260126.csv)")
+    ap.add_argument("--output", help="Output CSV (with --results) or JSONL (corpus-only)")
+    args = ap.parse_args(argv)
+
+    if args.results:
+        output = args.output or default_output_path(args.results)
+        if os.path.realpath(output) == os.path.realpath(args.results):
+            ap.error(f"--output {output} would overwrite --results")
+        resolve_results(args.results, args.corpus, output)
+    else:
+        list_references(args.corpus, args.output or "./data/cross_references.jsonl")
+
+
+if __name__ == "__main__":
+    main()
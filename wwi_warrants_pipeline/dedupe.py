@@ -0,0 +1,313 @@
+import os
+import random
+import re
+import time
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .compressed_io import open_text
+from .jsonl_codec import dumps, loads
+from .jsonl_index import JsonlIndex
+
+# ----------------------------
+# Near-duplicate page detection (MinHash + LSH)
+# ----------------------------
+#
+# Rescans and overlapping volume exports give the same page twice with slightly
+# different OCR text, so the SHA1 ids differ and exact matching misses them.
+# Each page's text is normalised and cut into character shingles; a MinHash
+# signature of NUM_PERM values estimates the Jaccard similarity of two shingle
+# sets by the fraction of positions where their signatures agree.
+#
+# To avoid comparing every pair, the signature is split into BANDS bands of
+# ROWS values. Pages that agree on a whole band land in the same bucket and
+# become candidates; with 20 x 6 a pair at similarity 0.8 is found with
+# probability > 0.99 and one at 0.4 rarely. Candidates are then checked against
+# `threshold` on the full signature and joined into groups (union-find).
+# Buckets are built one band at a time, so memory is the signatures
+# (NUM_PERM * 4 bytes per page) plus one band's dict.
+#
+# Each group keeps the page with the fewest `total-fallback-pages` (the OCR
+# fell back to a worse path less often), earliest in the corpus on a tie.
+# Union-find links chains (A~B and B~C while A and C differ), so only members
+# at `threshold` or above against the kept page become its duplicates; the
+# rest are clustered again the same way among themselves. The result is a
+# JSONL of clusters that the extractors load to skip the other pages and to
+# list their Source-Files on the kept page's rows. A duplicate is only skipped
+# while its kept page is in the corpus and has not been dead-lettered.
+#
+# numpy is used for the signatures if installed; the pure-Python path gives
+# identical signatures, and --workers spreads it over processes. numpy is only
+# loaded when signatures are computed, so the extractors can read the cluster
+# file (load_duplicates) without it.
+
+NUM_PERM = 120
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_CHARS = 5
+DEFAULT_THRESHOLD = 0.8
+# Very short pages (a header, "blank page") look alike without being the same page
+MIN_SHINGLES = 40
+SEED = 1918
+
+DEFAULT_CORPUS = "./data/individual_narratives.jsonl"
+DEFAULT_OUTPUT = "./data/near_duplicates.jsonl"
+
+_MASK64 = (1 << 64) - 1
+
+# Multiply-shift hash family: h_i(x) = ((a_i * x + b_i) mod 2^64) >> 32
+_rng = random.Random(SEED)
+_PERMS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_PERM)]
+
+_np = None  # numpy module once loaded, False if it is not installed
+_PERM_A = _PERM_B = None
+
+
+def _numpy():
+    """
+    numpy (loading it and the permutation arrays on first call), or None.
+    """
+    global _np, _PERM_A, _PERM_B
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            _np = False
+        else:
+            _PERM_A = numpy.array([a for a, _ in _PERMS], dtype=numpy.uint64)[:, None]
+            _PERM_B = numpy.array([b for _, b in _PERMS], dtype=numpy.uint64)[:, None]
+            _np = numpy
+    return _np or None
+
+_SPACE_RE = re.compile(r"\s+")
+# Markdown emphasis/table characters olmOCR adds inconsistently between scans
+_MARKUP_RE = re.compile(r"[*_#|`>]+")
+
+
+def shingle_hashes(text: str) -> List[int]:
+    """
+    32-bit hashes of the distinct SHINGLE_CHARS-character shingles of the
+    normalised text (lower case, markup stripped, whitespace collapsed).
+    """
+    norm = _SPACE_RE.sub(" ", _MARKUP_RE.sub("", text.lower())).strip().encode("utf-8")
+    k = SHINGLE_CHARS
+    return list({zlib.crc32(norm[i:i + k]) for i in range(len(norm) - k + 1)})
+
+
+def minhash(hashes: List[int]) -> array:
+    """
+    MinHash signature (NUM_PERM unsigned 32-bit values) of a set of shingle hashes.
+    """
+    np = _numpy()
+    if np is not None:
+        hv = np.array(hashes, dtype=np.uint64)[None, :]
+        # uint64 arithmetic wraps, i.e. is already mod 2^64
+        return array("I", ((_PERM_A * hv + _PERM_B) >> np.uint64(32)).min(axis=1).astype(np.uint32).tobytes())
+    return array("I", [min(((a * h + b) & _MASK64) >> 32 for h in hashes) for a, b in _PERMS])
+
+
+def similarity(sig_a, sig_b) -> float:
+    """
+    Estimated Jaccard similarity: the fraction of equal signature positions.
+    """
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+# ---- Signatures ----
+
+def _signature_slice(args: Tuple[str, int, int]) -> Tuple[List[Tuple[int, str, str, int]], bytes]:
+    """
+    Signs pages start..stop-1 of a corpus. Returns the page info
+    (line_no, id, Source-File, fallback pages) and the concatenated signatures.
+    Pages too short to compare get no signature and are left out.
+    """
+    corpus_path, start, stop = args
+    pages = []
+    sigs = array("I")
+    with JsonlIndex(corpus_path) as corpus:
+        for line_no, page in corpus.iter_pages(start=start, stop=stop):
+            hashes = shingle_hashes(page.text)
+            if len(hashes) < MIN_SHINGLES:
+                continue
+            pages.append((line_no, page.id, page.source_file, page.fallback_pages))
+            sigs.extend(minhash(hashes))
+    return pages, sigs.tobytes()
+
+
+def compute_signatures(corpus_path: str, workers: int = 1) -> Tuple[List[Tuple[int, str, str, int]], array]:
+    """
+    Signs every page of the corpus, in file order. With workers > 1 the corpus
+    is split into byte-balanced line ranges (JsonlIndex.slices) signed in parallel.
+    """
+    with JsonlIndex(corpus_path) as corpus:
+        slices = corpus.slices(workers)
+    jobs = [(corpus_path, start, stop) for start, stop in slices]
+
+    if workers > 1 and len(jobs) > 1:
+        from multiprocessing import Pool
+        with Pool(min(workers, len(jobs))) as pool:
+            results = pool.map(_signature_slice, jobs)
+    else:
+        results = [_signature_slice(job) for job in jobs]
+
+    pages = []
+    sigs = array("I")
+    for slice_pages, slice_sigs in results:
+        pages.extend(slice_pages)
+        sigs.frombytes(slice_sigs)
+    return pages, sigs
+
+
+# ---- LSH + clustering ----
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_clusters(sigs: array, threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """
+    Groups signature rows (0..n-1) linked by pairs whose estimated similarity is
+    >= threshold and returns the groups with more than one member. Members are
+    connected through such pairs, not necessarily similar to every other member.
+
+    Within a bucket each page is compared with the bucket's first page only, so
+    a large bucket of boilerplate-alike pages costs linear, not quadratic, time;
+    a pair missed that way is still found through any other band they share.
+    """
+    n = len(sigs) // NUM_PERM
+    parent = list(range(n))
+    checked = set()
+
+    def sig(i):
+        return sigs[i * NUM_PERM:(i + 1) * NUM_PERM]
+
+    for band in range(BANDS):
+        buckets = {}
+        lo = band * ROWS
+        for i in range(n):
+            key = sigs[i * NUM_PERM + lo:i * NUM_PERM + lo + ROWS].tobytes()
+            first = buckets.setdefault(key, i)
+            if first == i:
+                continue
+            pair = (first, i)
+            if pair in checked:
+                continue
+            checked.add(pair)
+            sim = similarity(sig(first), sig(i))
+            if sim >= threshold:
+                ra, rb = _find(parent, first), _find(parent, i)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(_find(parent, i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def find_near_duplicates(corpus_path: str, threshold: float = DEFAULT_THRESHOLD, workers: int = 1) -> List[dict]:
+    """
+    Returns one dict per cluster of near-duplicate pages:
+        {"id", "source_file", "fallback_pages",
+         "duplicates": [{"id", "source_file", "fallback_pages", "similarity"}, ...]}
+    where the top level is the page to keep. Every duplicate is at least
+    `threshold` similar to the kept page itself.
+    """
+    pages, sigs = compute_signatures(corpus_path, workers)
+    groups = find_clusters(sigs, threshold)
+
+    def sig(i):
+        return sigs[i * NUM_PERM:(i + 1) * NUM_PERM]
+
+    clusters = []
+    for members in groups:
+        # Fewest fallback pages wins; earlier in the corpus breaks ties
+        members.sort(key=lambda i: (pages[i][3], pages[i][0]))
+        # Members too far from the kept page (linked only through a chain)
+        # are clustered again among themselves, keeping the same order
+        while len(members) > 1:
+            keep = members[0]
+            keep_sig = sig(keep)
+            duplicates, rest = [], []
+            for i in members[1:]:
+                sim = similarity(keep_sig, sig(i))
+                if sim < threshold:
+                    rest.append(i)
+                    continue
+                _, rec_id, sf, fb = pages[i]
+                duplicates.append({"id": rec_id, "source_file": sf, "fallback_pages": fb, "similarity": round(sim, 3)})
+            if duplicates:
+                _, keep_id, keep_sf, keep_fb = pages[keep]
+                clusters.append({"id": keep_id, "source_file": keep_sf, "fallback_pages": keep_fb, "duplicates": duplicates})
+            members = rest
+    return clusters
+
+
+# ---- Cluster file ----
+
+def write_clusters(clusters: List[dict], output_path: str):
+    with open_text(output_path, "w") as out:
+        for cluster in clusters:
+            out.write(dumps(cluster) + "\n")
+
+
+def iter_clusters(path: str) -> Iterator[dict]:
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def load_duplicates(path: str, corpus_path: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    Reads a cluster file for the extractors. Returns
+    (duplicate id -> kept id, kept id -> Source-Files of its duplicates).
+    Both are empty if the file does not exist (no dedupe run yet). With
+    corpus_path, clusters whose kept page is not in that corpus are left out,
+    so their duplicates are extracted instead of skipped.
+    """
+    duplicate_of = {}
+    linked_source_files = {}
+    if not path or not os.path.exists(path):
+        return duplicate_of, linked_source_files
+    corpus = JsonlIndex(corpus_path) if corpus_path else None
+    try:
+        clusters = [c for c in iter_clusters(path) if corpus is None or corpus.line_of(c["id"]) is not None]
+    finally:
+        if corpus is not None:
+            corpus.close()
+    for cluster in clusters:
+        for dup in cluster["duplicates"]:
+            duplicate_of[dup["id"]] = cluster["id"]
+        linked_source_files[cluster["id"]] = [dup["source_file"] for dup in cluster["duplicates"]]
+    return duplicate_of, linked_source_files
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants dedupe", description="Find near-duplicate pages so extraction skips them.")
+    ap.add_argument("--corpus", default=DEFAULT_CORPUS)
+    ap.add_argument("--output", default=DEFAULT_OUTPUT, help="Cluster JSONL read by `wwi-warrants extract`")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum estimated Jaccard similarity of the shingle sets")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+
+    start = time.time()
+    clusters = find_near_duplicates(args.corpus, args.threshold, args.workers)
+    write_clusters(clusters, args.output)
+
+    skipped = sum(len(cluster["duplicates"]) for cluster in clusters)
+    print(f"{len(clusters)} clusters, {skipped} duplicate pages to skip ({time.time() - start:.1f}s, "
+          f"{'numpy' if _numpy() is not None else 'pure Python'} signatures) -> {args.output}")
+    for cluster in clusters[:10]:
+        dups = ", ".join(f"{d['source_file']} ({d['similarity']:.2f})" for d in cluster["duplicates"])
+        print(f"  keep {cluster['source_file']}: {dups}")
+
+
+if __name__ == "__main__":
+    main()
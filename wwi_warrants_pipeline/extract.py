@@ -0,0 +1,790 @@
+import csv
+import os
+import time
+from typing import TYPE_CHECKING, List, Optional
+from .context_cache import PromptCache, load_few_shot_examples, schema_instruction
+
+# The schema, corpus, codec, queue and dedupe helpers (and pydantic, msgspec,
+# zstandard and sqlite3 behind them) are imported by the functions that use
+# them, so that `wwi-warrants extract --help` only has to load this file
+if TYPE_CHECKING:
+    from .jsonl_codec import Page
+
+# 1. The Schema
+# CaseEvent / PersonRecord / ExtractionResponse live in extraction_schema.py and
+# are imported when a run starts, so `extract --help` does not load pydantic
+SCHEMA_CLASSES = ("CaseEvent", "PersonRecord", "ExtractionResponse")
+
+def __getattr__(name):
+    # extract.PersonRecord etc. still work for callers that used them from here
+    if name in SCHEMA_CLASSES:
+        from . import extraction_schema
+        return getattr(extraction_schema, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 2. Gemini API Configuration
+apiKey = os.getenv("GEMINI_API_KEY", "")
+MODEL_ID = "gemini-3-flash-preview" 
+
+# The client and prompt cache are created by init_client() when a run starts,
+# so importing this module (CLI, tests, worker pools) never touches the SDK
+client = None
+
+# The instruction, schema and few-shot pages are identical for every batch, so they are
+# uploaded once as a provider-side context cache and referenced by name from each call.
+# If the model/key does not support caching the same prefix is sent inline instead.
+SYSTEM_PROMPT = (
+    "You are a specialized historical researcher. Extract every individual from the following batch of warrant log text blocks. "
+    "Pay attention to case IDs (###-####) and clerk shorthand for nationalities. Nationalities are listed after the name on the same line and are abbreviated where gen, Ger, ger, per, mean German, and Austrian might be Aus, aus, or aust."
+)
+USE_CONTEXT_CACHE = True
+CACHE_TTL_SECONDS = 3600
+# Optional worked batches, {"text": <BATCH DATA prompt>, "people": [...]} per line (format in
+# context_cache.py). Without them the prefix is below the provider's minimum cache size and runs inline.
+FEW_SHOT_FILE = './data/few_shot_examples.jsonl'
+
+prompt_cache = None
+
+def init_client():
+    """
+    Creates the Gemini client and the prompt cache. Call once per process before extracting.
+    """
+    global client, prompt_cache, RESPONSE_CONFIG
+    from google import genai
+    from .extraction_schema import ExtractionResponse
+
+    client = genai.Client(api_key=apiKey)
+    RESPONSE_CONFIG = {
+        "response_mime_type": "application/json",
+        "response_schema": ExtractionResponse.model_json_schema(),
+    }
+    prompt_cache = PromptCache(
+        client.caches,
+        MODEL_ID,
+        SYSTEM_PROMPT,
+        examples=load_few_shot_examples(FEW_SHOT_FILE),
+        ttl_seconds=CACHE_TTL_SECONDS,
+        enabled=USE_CONTEXT_CACHE,
+        # The schema text rides along only in the cache; requests carry it as response_schema
+        cache_instruction=schema_instruction(SYSTEM_PROMPT, ExtractionResponse),
+    )
+
+def build_batch_prompt(batch_texts: List[str]) -> str:
+    """
+    Builds a single prompt containing all text blocks with clear delimiters,
+    each block explicitly indexed (0, 1, 2...).
+    """
+    combined_text = ""
+    for idx, text in enumerate(batch_texts):
+        combined_text += f"\n--- TEXT BLOCK {idx} ---\n{text}\n"
+
+    # The instructions live in the cached (or inline) system prompt
+    return f"BATCH DATA:\n{combined_text}"
+
+RESPONSE_CONFIG = None # Built by init_client()
+
+class BlockedResponse(Exception):
+    """
+    The model refused the request (safety/recitation block) or returned no text.
+    """
+
+class MalformedResponse(ValueError):
+    """
+    The response body is not valid JSON for the schema, or ended before it was closed.
+    """
+
+def blocked_reason(response) -> Optional[str]:
+    """
+    The block or finish reason if the response was stopped by a safety filter, else None.
+    """
+    feedback = getattr(response, "prompt_feedback", None)
+    if feedback is not None and getattr(feedback, "block_reason", None):
+        return str(feedback.block_reason)
+    for candidate in getattr(response, "candidates", None) or []:
+        reason = str(getattr(candidate, "finish_reason", "") or "")
+        if reason.endswith(("SAFETY", "PROHIBITED_CONTENT", "BLOCKLIST", "SPII", "RECITATION")):
+            return reason
+    return None
+
+# Retrying the identical request will not fix these, so they go straight to
+# bisection instead of through the backoff loop meant for transport errors.
+# Anything else (timeouts, 5xx, quota, auth) is about the service, not the pages.
+DETERMINISTIC_ERRORS = (BlockedResponse, MalformedResponse)
+
+def extract_from_batch(batch_texts: List[str], max_attempts: int = 6):
+    """
+    Sends a batch of text blocks to Gemini.
+    Constructs a prompt where each block is explicitly indexed (0, 1, 2...).
+    Schema violations and blocked responses are raised without retrying;
+    other errors are retried with backoff and re-raised after max_attempts.
+    """
+    if not apiKey:
+        raise ValueError("API Key is missing. Please set the GEMINI_API_KEY environment variable.")
+    
+    from pydantic import ValidationError
+    from .extraction_schema import ExtractionResponse
+
+    prompt = build_batch_prompt(batch_texts)
+
+    for i in range(max_attempts):
+        try:
+            response = prompt_cache.generate(client.models, RESPONSE_CONFIG, prompt)
+            reason = blocked_reason(response)
+            if reason or response.text is None:
+                raise BlockedResponse(reason or "Response has no text")
+            try:
+                return ExtractionResponse.model_validate_json(response.text)
+            except ValidationError as ve:
+                raise MalformedResponse(f"ValidationError: {ve}") from ve
+            
+        except Exception as e:
+            if isinstance(e, DETERMINISTIC_ERRORS):
+                print(f"  !! {type(e).__name__}, not retrying: {e}")
+                raise e
+            if i == max_attempts - 1: 
+                print(f"  !! API Error after retries: {e}")
+                raise e
+            wait_time = 2 ** i
+            time.sleep(wait_time) 
+            
+    return ExtractionResponse(people=[])
+
+# --- STREAMING ---
+# With STREAMING on, the response body is parsed as it arrives and each person is
+# validated and handed to on_person as soon as its JSON object closes. The first
+# rows of a batch reach the CSV while the model is still generating the rest, and
+# a truncated stream only loses the people it had not finished yet.
+STREAMING = True
+
+def stream_from_batch(batch_texts: List[str], on_person, max_attempts: int = 6):
+    """
+    Streaming version of extract_from_batch. Calls on_person(PersonRecord) for
+    each completed person. Failures before the first person are retried as
+    usual; a failure after that raises StreamTruncated so the caller only
+    re-runs the unfinished tail instead of the whole batch.
+    """
+    if not apiKey:
+        raise ValueError("API Key is missing. Please set the GEMINI_API_KEY environment variable.")
+
+    from pydantic import ValidationError
+    from .extraction_schema import PersonRecord
+    from .jsonl_codec import DecodeError
+    from .stream_parse import PeopleStreamParser, StreamTruncated
+
+    prompt = build_batch_prompt(batch_texts)
+
+    for i in range(max_attempts):
+        parser = PeopleStreamParser()
+        delivered = 0
+        try:
+            for chunk in prompt_cache.generate_stream(client.models, RESPONSE_CONFIG, prompt):
+                reason = blocked_reason(chunk)
+                if reason:
+                    raise BlockedResponse(reason)
+                try:
+                    people = [PersonRecord.model_validate(d) for d in parser.feed(chunk.text or "")]
+                except (ValidationError, *DecodeError) as ve:
+                    raise MalformedResponse(f"{type(ve).__name__}: {ve}") from ve
+                for person in people:
+                    on_person(person)
+                    delivered += 1
+            if not parser.complete:
+                raise MalformedResponse("Response stream ended before the JSON body was closed")
+            return
+
+        except Exception as e:
+            if delivered:
+                print(f"  !! Stream cut off after {delivered} people: {e}")
+                raise StreamTruncated(delivered, e)
+            if isinstance(e, DETERMINISTIC_ERRORS):
+                print(f"  !! {type(e).__name__}, not retrying: {e}")
+                raise e
+            if i == max_attempts - 1: 
+                print(f"  !! API Error after retries: {e}")
+                raise e
+            wait_time = 2 ** i
+            time.sleep(wait_time) 
+
+# --- FAILURE ISOLATION ---
+# A schema violation, truncated JSON body or safety block on one page should not
+# cost the other pages in its batch. When a batch fails that way we split it in
+# half and retry each half, recursing down to single pages. A single page that
+# still fails is written to the dead-letter file with its error and skipped;
+# `extract --retry-dead-letter` runs those pages again.
+#
+# Transport, quota and auth errors say nothing about the pages. Once the backoff
+# retries are used up they stop the run: file mode does not advance the
+# checkpoint and queue mode releases the unit, so nothing is skipped.
+dead_letter_file = 'dead_letter.jsonl'
+dead_letter_ids = set() # Filled from the dead-letter file when a run starts
+
+def load_dead_letter_ids(path: str) -> set:
+    """
+    Returns the record ids already recorded as irreducible failures, so a resumed
+    run does not pay for them again. `extract --retry-dead-letter` retries them.
+    """
+    from .jsonl_codec import DecodeError, loads
+
+    bad_ids = set()
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip(): continue
+                try:
+                    bad_ids.add(loads(line).get('id'))
+                except DecodeError:
+                    continue
+    return bad_ids
+
+def record_dead_letter(source_data: "Page", error: Exception):
+    """
+    Appends a single failing page (with its error) to the dead-letter file.
+    """
+    from .jsonl_codec import dumps
+
+    entry = {
+        'id': source_data.id,
+        'source_file': source_data.source_file,
+        'error_type': type(error).__name__,
+        'error': str(error),
+        'failed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'text': source_data.text,
+    }
+    with open(dead_letter_file, 'a') as dl:
+        dl.write(dumps(entry) + "\n")
+    dead_letter_ids.add(entry['id'])
+
+def extract_with_bisection(batch_items: List["Page"], on_person, offset: int = 0, max_attempts: int = 6, seen: Optional[set] = None):
+    """
+    Extracts people from batch_items, splitting the batch in halves on failure.
+    Calls on_person(block_index, PersonRecord) where block_index is relative to the
+    original batch (offset is the position of batch_items[0] in that batch).
+
+    If a stream is cut off part way, the people already received are kept and only
+    the tail is re-run. It starts at the first block that produced nobody (the model
+    may have skipped it) or, if there is none before it, at the last block that
+    produced a person (it may be missing its later people). `seen` suppresses people
+    that were already written.
+
+    Only DETERMINISTIC_ERRORS and truncated streams are bisected; any other error
+    (still failing after the retries) is raised to the caller.
+    """
+    from .stream_parse import StreamTruncated
+
+    text_batch = [item.text for item in batch_items]
+    emitted = set()
+
+    def emit(person):
+        idx = person.text_block_index
+        # Safety check: ensure index is valid for this (sub-)batch
+        if not 0 <= idx < len(batch_items):
+            print(f"  !! Warning: Model returned invalid block index {idx} for {person.name}")
+            return
+        key = (offset + idx, person.id, person.name)
+        if seen and key in seen:
+            return
+        emitted.add(key)
+        on_person(offset + idx, person)
+
+    try:
+        if STREAMING:
+            stream_from_batch(text_batch, emit, max_attempts=max_attempts)
+        else:
+            result = extract_from_batch(text_batch, max_attempts=max_attempts)
+            for person in result.people:
+                emit(person)
+    except Exception as e:
+        if emitted:
+            done = {key[0] - offset for key in emitted}
+            last = max(done)
+            start = next((i for i in range(last) if i not in done), last)
+            print(f"  !! Re-running tail from block {offset + start} ({len(batch_items) - start} blocks)")
+            extract_with_bisection(batch_items[start:], on_person, offset + start, max_attempts, (seen or set()) | emitted)
+            return
+        if not isinstance(e, DETERMINISTIC_ERRORS + (StreamTruncated,)):
+            raise
+        if len(batch_items) == 1:
+            source_pdf = batch_items[0].source_file
+            print(f"  !! Dead-lettering block {offset} ({source_pdf}): {e}")
+            record_dead_letter(batch_items[0], e)
+            return
+        mid = len(batch_items) // 2
+        print(f"  !! Batch of {len(batch_items)} failed, splitting into {mid} + {len(batch_items) - mid}")
+        extract_with_bisection(batch_items[:mid], on_person, offset, max_attempts, seen)
+        extract_with_bisection(batch_items[mid:], on_person, offset + mid, max_attempts, seen)
+
+# --- NEAR-DUPLICATES ---
+# Pages that `wwi-warrants dedupe` found to be rescans of another page are not
+# sent to the model. The kept page's rows list their Source-Files instead, so
+# every scan of a page stays linked to the people extracted from it. A duplicate
+# is only skipped while its kept page is in the corpus and not dead-lettered;
+# otherwise it is extracted like any other page so its text is not lost.
+DUPLICATES_FILE = './data/near_duplicates.jsonl' # dedupe.DEFAULT_OUTPUT
+duplicate_of = {} # duplicate id -> kept id
+linked_source_files = {} # kept id -> Source-Files of its duplicates
+
+def process_batch(batch_items: List["Page"], write_row) -> List[str]:
+    """
+    Runs one batch through extract_with_bisection and calls write_row(dict) for
+    each person as soon as it is received. Pages already in the dead-letter file
+    and near-duplicates of other pages are skipped. Returns the names for the log.
+    """
+    def covered_elsewhere(item):
+        kept_id = duplicate_of.get(item.id)
+        return kept_id is not None and kept_id not in dead_letter_ids
+
+    # Keep each page's position in the full batch for text_block_index
+    kept = [(orig_idx, item) for orig_idx, item in enumerate(batch_items)
+            if item.id not in dead_letter_ids and not covered_elsewhere(item)]
+    processed_names_log = []
+    if not kept:
+        return processed_names_log
+
+    batch_start = time.time()
+
+    def write_person(sent_idx, person):
+        idx, source_data = kept[sent_idx]
+        source_pdf = source_data.source_file
+        # The page's own JSONL line is already the JSON we want; no re-encode per person
+        raw_json = source_data.raw
+
+        print(f"  > Found: {person.name} (Block {idx} -> {source_pdf}, {time.time() - batch_start:.1f}s)")
+
+        # Build the CSV row straight from the model's attributes (no model_dump round trip)
+        event_str = " | ".join([f"{e.date or 'No Date'}: {e.action or 'No Action'}" for e in person.events])
+        record_dict = {
+            'id': person.id,
+            'name': person.name,
+            'alias': person.alias,
+            'location': person.location,
+            'nationality': person.nationality,
+            'final_status': person.final_status,
+            'final_status_date': person.final_status_date,
+            # STRICT METADATA ASSIGNMENT HERE
+            'source_file': source_pdf,
+            'chronology': event_str,
+            'raw_json_input': raw_json,
+            # Index within the full batch, not the sub-batch the model saw
+            'text_block_index': idx,
+            'duplicate_source_files': "; ".join(linked_source_files.get(source_data.id, [])),
+        }
+
+        write_row(record_dict)
+        processed_names_log.append(f"{person.name} ({person.id})")
+
+    extract_with_bisection([item for _, item in kept], write_person)
+    print(f"  Batch took {time.time() - batch_start:.1f}s")
+
+    return processed_names_log
+
+# 3. Processing the Large JSONL File with Batches
+input_file = './data/individual_narratives.jsonl' # .jsonl.zst / .jsonl.gz also work
+output_file = 'warrant_results_20260126.csv' # Name it .csv.zst / .csv.gz to write it compressed
+checkpoint_file = 'checkpoint.txt'
+log_file = 'processing_log.txt'
+BATCH_SIZE = 10 # Adjust this to change how much context the model sees (10-20 is usually good)
+
+fieldnames = [
+    'id', 'name', 'alias', 'location', 'nationality', 
+    'final_status', 'final_status_date', 'source_file',
+    'chronology', 'raw_json_input', 'text_block_index',
+    'duplicate_source_files'
+]
+
+# --- WORK QUEUE MODE ---
+# Set WARRANTS_QUEUE_DB (or pass --queue-db) to a queue created with `wwi-warrants queue enqueue`
+# and start as many `wwi-warrants extract` processes as you like (different machines and/or
+# different GEMINI_API_KEYs). Each one leases a unit of record ids, extracts it,
+# and commits its rows to the queue; `wwi-warrants queue export` writes the CSV.
+# The checkpoint file and output CSV are not used in this mode. Workers on several
+# machines need a queue made without `--single-host` (see work_queue.py).
+QUEUE_DB = os.getenv("WARRANTS_QUEUE_DB", "")
+LEASE_SECONDS = None # None: work_queue.DEFAULT_LEASE_SECONDS
+
+def run_queue_worker(db_path: str, input_file: str = input_file):
+    """
+    Drains the work queue: lease a unit, extract it while heartbeating, commit.
+    """
+    from .jsonl_index import JsonlIndex
+    from .work_queue import DEFAULT_LEASE_SECONDS, Heartbeat, WorkQueue, default_worker_id
+
+    lease_seconds = LEASE_SECONDS or DEFAULT_LEASE_SECONDS
+    worker_id = default_worker_id()
+    done = 0
+    print(f"Worker {worker_id} draining {db_path}...")
+    with WorkQueue(db_path) as queue, JsonlIndex(input_file) as corpus:
+        while True:
+            leased = queue.lease(worker_id, lease_seconds)
+            if leased is None:
+                break
+            unit_id, record_ids = leased
+            batch_items = []
+            for rec_id in record_ids:
+                page = corpus.get_page(rec_id)
+                if page is None:
+                    print(f"  !! Record {rec_id} of unit {unit_id} not found in {input_file}")
+                    continue
+                batch_items.append(page)
+
+            print(f"Processing unit {unit_id} ({len(batch_items)} pages)...")
+            rows = []
+            try:
+                with Heartbeat(db_path, unit_id, worker_id, lease_seconds) as hb:
+                    process_batch(batch_items, rows.append)
+            except BaseException:
+                queue.release(unit_id, worker_id)
+                raise
+
+            if hb.lost or not queue.complete(unit_id, worker_id, rows):
+                print(f"  !! Lease on unit {unit_id} was lost; another worker will redo it, discarding {len(rows)} rows")
+                continue
+            done += 1
+        progress = queue.progress()
+
+    print(prompt_cache.summary())
+    prompt_cache.close()
+    print(f"\nWorker {worker_id} finished {done} units; queue now {progress}")
+
+
+def run_extraction(input_file: str = input_file, output_file: str = output_file, batch_size: int = BATCH_SIZE):
+    """
+    File mode: extracts input_file batch by batch into output_file, resuming
+    from the checkpoint file and appending to the CSV if a previous run stopped.
+    """
+    from .compressed_io import open_text
+    from .jsonl_index import JsonlIndex
+
+    # --- RESILIENCE SETUP ---
+    # Check for existing checkpoint to resume from
+    start_line = 0
+    if os.path.exists(checkpoint_file):
+        try:
+            with open(checkpoint_file, 'r') as f:
+                start_line = int(f.read().strip())
+                print(f"Found checkpoint. Resuming from line {start_line}...")
+        except ValueError:
+            print("Checkpoint file corrupt. Starting from beginning.")
+
+    # Determine CSV mode: 'a' (append) if resuming, 'w' (write) if new
+    write_header = not os.path.exists(output_file) or start_line == 0
+    csv_mode = 'a' if not write_header else 'w'
+
+    print(f"Starting batch extraction from {input_file}...")
+    
+    # Open the CSV file ONCE in append/write mode
+    with open_text(output_file, csv_mode, newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        def write_row(record_dict):
+            writer.writerow(record_dict)
+            # For .gz/.zst output this is a sync flush inside the current frame, not a new frame
+            csvfile.flush()
+        
+        if write_header:
+            writer.writeheader()
+            # If we are starting fresh, clear the log file too
+            if os.path.exists(log_file):
+                os.remove(log_file)
+        
+        # The byte-offset index lets a resumed run seek straight to start_line
+        # instead of decoding every line before it (blank lines are skipped, invalid ones with a warning)
+        with JsonlIndex(input_file) as corpus:
+            # Corrupt lines are skipped (with a warning); keep a record of them in the log
+            bad_lines = sorted(n + 1 for n in corpus.invalid_lines if n >= start_line)
+            if bad_lines:
+                with open(log_file, 'a') as lf:
+                    lf.write(f"Invalid JSON, not extracted: lines {', '.join(map(str, bad_lines))}\n")
+
+            # Buffer to hold lines until we reach batch_size
+            batch_buffer = [] 
+            
+            # Only id/text/Source-File are decoded; the raw line is kept for raw_json_input
+            for i, page in corpus.iter_pages(start=start_line):
+                batch_buffer.append(page)
+                
+                # Check if batch is full
+                if len(batch_buffer) >= batch_size:
+                    print(f"Processing Batch (Lines {i+1-batch_size} to {i+1})...")
+                    
+                    # Call API (failed batches are bisected; bad pages are dead-lettered)
+                    processed_names_log = process_batch(batch_buffer, write_row)
+
+                    # FLUSH data to disk immediately (Safe against crashes)
+                    csvfile.flush()
+                    
+                    # UPDATE LOG FILE
+                    with open(log_file, 'a') as lf:
+                        lf.write(f"Batch ending at line {i+1}:\n")
+                        for name in processed_names_log:
+                            lf.write(f"  - {name}\n")
+                        lf.write("-" * 20 + "\n")
+
+                    # UPDATE CHECKPOINT
+                    # We save the index of the next line to be processed (i + 1)
+                    with open(checkpoint_file, 'w') as cf:
+                        cf.write(str(i + 1))
+
+                    # Clear buffer
+                    batch_buffer = []
+
+            # Process remaining items in buffer (if any)
+            if batch_buffer:
+                print(f"Processing Final Batch ({len(batch_buffer)} items)...")
+                processed_names_log = process_batch(batch_buffer, write_row)
+                
+                csvfile.flush()
+                
+                # Update Log for final batch
+                with open(log_file, 'a') as lf:
+                    lf.write(f"Final Batch ending at line {i+1}:\n")
+                    for name in processed_names_log:
+                        lf.write(f"  - {name}\n")
+                    lf.write("--- EXTRACTION COMPLETE ---\n")
+
+                # Update checkpoint one last time
+                with open(checkpoint_file, 'w') as cf:
+                    cf.write(str(i + 1))
+
+    print(prompt_cache.summary())
+    prompt_cache.close()
+    print(f"\nFinished! Results saved to {output_file}")
+
+def retry_dead_letters(input_file: str = input_file, output_file: str = output_file, batch_size: int = BATCH_SIZE):
+    """
+    Re-extracts the pages in the dead-letter file and appends their rows to
+    output_file. After each batch the file is rewritten without the pages that
+    succeeded, so an interrupted retry can simply be started again. Pages that
+    fail again stay in it with their new error. The checkpoint is not touched.
+    """
+    from .compressed_io import open_text
+    from .jsonl_codec import DecodeError, dumps, loads
+    from .jsonl_index import JsonlIndex
+
+    def read_entries() -> dict:
+        # Latest entry per id, in file order
+        entries = {}
+        if os.path.exists(dead_letter_file):
+            with open(dead_letter_file, 'r') as f:
+                for line in f:
+                    if not line.strip(): continue
+                    try:
+                        entry = loads(line)
+                    except DecodeError:
+                        continue
+                    entries[entry.get('id')] = entry
+        return entries
+
+    retry_ids = list(read_entries())
+    if not retry_ids:
+        print(f"No dead-lettered pages in {dead_letter_file}.")
+        return
+
+    write_header = not os.path.exists(output_file)
+    print(f"Retrying {len(retry_ids)} dead-lettered pages into {output_file}...")
+    with JsonlIndex(input_file) as corpus, open_text(output_file, 'w' if write_header else 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        if write_header:
+            writer.writeheader()
+
+        def write_row(record_dict):
+            writer.writerow(record_dict)
+            csvfile.flush()
+
+        pages = []
+        for rec_id in retry_ids:
+            page = corpus.get_page(rec_id)
+            if page is None:
+                print(f"  !! Dead-lettered record {rec_id} not found in {input_file}")
+                continue
+            pages.append(page)
+
+        recovered = 0
+        for start in range(0, len(pages), batch_size):
+            batch = pages[start:start + batch_size]
+            batch_ids = {page.id for page in batch}
+            dead_letter_ids.difference_update(batch_ids)
+            print(f"Retrying pages {start + 1} to {start + len(batch)}...")
+            process_batch(batch, write_row)
+            csvfile.flush()
+
+            # Pages that failed again were re-recorded (appended) by record_dead_letter
+            succeeded = batch_ids - dead_letter_ids
+            recovered += len(succeeded)
+            remaining = read_entries()
+            with open(dead_letter_file, 'w') as dl:
+                for rec_id, entry in remaining.items():
+                    if rec_id not in succeeded:
+                        dl.write(dumps(entry) + "\n")
+
+    print(prompt_cache.summary())
+    prompt_cache.close()
+    print(f"\nRecovered {recovered} of {len(pages)} pages; {len(pages) - recovered} remain in {dead_letter_file}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    global STREAMING, USE_CONTEXT_CACHE
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants extract", description="Extract people from the narrative pages with Gemini.")
+    ap.add_argument("--input", default=input_file, help="Page corpus (.jsonl, .jsonl.gz or .jsonl.zst)")
+    ap.add_argument("--output", default=output_file, help="Results CSV (.csv, .csv.gz or .csv.zst)")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--queue-db", default=QUEUE_DB, help="Work queue to drain instead of the checkpointed file run (default: $WARRANTS_QUEUE_DB)")
+    ap.add_argument("--no-stream", action="store_true", help="Wait for whole responses instead of streaming")
+    ap.add_argument("--no-cache", action="store_true", help="Send the instruction prefix inline instead of as a context cache")
+    ap.add_argument("--per-page", action="store_true", help="One request per page (extract_single.py) instead of batches")
+    ap.add_argument("--duplicates", default=DUPLICATES_FILE, help="Near-duplicate clusters from `wwi-warrants dedupe` (skipped if missing)")
+    ap.add_argument("--retry-dead-letter", action="store_true", help=f"Re-run only the pages in {dead_letter_file}, appending their rows to --output")
+    args = ap.parse_args(argv)
+
+    if not apiKey:
+        ap.error("API Key is missing. Please set the GEMINI_API_KEY environment variable.")
+    if not os.path.exists(args.input):
+        print(f"Error: File not found at {args.input}")
+        return
+
+    STREAMING = not args.no_stream
+    USE_CONTEXT_CACHE = not args.no_cache
+
+    if args.per_page:
+        from . import extract_single
+        extract_single.USE_CONTEXT_CACHE = USE_CONTEXT_CACHE
+        extract_single.DUPLICATES_FILE = args.duplicates
+        extract_single.init_client()
+        extract_single.run_extraction(args.input, args.output)
+        return
+
+    init_client()
+
+    # Pages that already failed on a previous run
+    dead_letter_ids.update(load_dead_letter_ids(dead_letter_file))
+    if dead_letter_ids and not args.retry_dead_letter:
+        print(f"Skipping {len(dead_letter_ids)} dead-lettered pages (see {dead_letter_file}).")
+
+    # Rescans of pages that are extracted anyway
+    from .dedupe import load_duplicates
+    dups, links = load_duplicates(args.duplicates, corpus_path=args.input)
+    duplicate_of.update(dups)
+    linked_source_files.update(links)
+    if duplicate_of:
+        print(f"Skipping {len(duplicate_of)} near-duplicate pages (see {args.duplicates}).")
+
+    if args.retry_dead_letter:
+        retry_dead_letters(args.input, args.output, args.batch_size)
+    elif args.queue_db:
+        run_queue_worker(args.queue_db, args.input)
+    else:
+        run_extraction(args.input, args.output, args.batch_size)
+
+def _self_check():
+    """
+    Offline check of bisection, dead-lettering and tail re-runs against a fake
+    model (no API key or network). Run with `python -m wwi_warrants_pipeline.extract --self-check`.
+    """
+    import json
+    import re
+    import tempfile
+    from .context_cache import LocalCacheBackend
+    from .jsonl_codec import Page
+
+    global apiKey, client, prompt_cache, RESPONSE_CONFIG, STREAMING, dead_letter_file
+
+    class _Chunk:
+        def __init__(self, text):
+            self.text = text
+            self.usage_metadata = None
+
+    class _Models:
+        """
+        Fake `client.models`: one person per text block, named after the block's
+        text. A block containing "BAD" makes the whole response fail the schema;
+        `down` raises a transport error and `cut_after` ends the next stream
+        after that many people.
+        """
+
+        def __init__(self):
+            self.calls = []
+            self.down = False
+            self.cut_after = None
+
+        def generate_content_stream(self, model, contents, config):
+            blocks = re.findall(r"--- TEXT BLOCK (\d+) ---\n(.*?)\n", contents[-1]["parts"][0]["text"])
+            self.calls.append([text for _, text in blocks])
+            if self.down:
+                raise ConnectionError("503 UNAVAILABLE")
+            if any("BAD" in text for _, text in blocks):
+                return iter([_Chunk('{"people": [{"text_block_index": 0, "nme": 1}]}')])
+            people = [{"text_block_index": int(i), "id": text, "name": text} for i, text in blocks]
+            body = json.dumps({"people": people})
+            if self.cut_after is not None:
+                cut, self.cut_after = self.cut_after, None
+                return self.cut_stream(body, people, cut)
+            return iter([_Chunk(body)])
+
+        def cut_stream(self, body, people, cut):
+            # Everything up to and including person `cut`, then the connection drops
+            end = body.index(json.dumps(people[cut])) if cut < len(people) else len(body) - 2
+            yield _Chunk(body[:end])
+            raise ConnectionError("connection reset")
+
+    saved = (apiKey, client, prompt_cache, RESPONSE_CONFIG, STREAMING, dead_letter_file, time.sleep)
+    models = _Models()
+    apiKey = "self-check"
+    client = type("Client", (), {"models": models})()
+    prompt_cache = PromptCache(LocalCacheBackend(), "local-model", "Extract people.")
+    RESPONSE_CONFIG = {}
+    STREAMING = True
+    time.sleep = lambda seconds: None
+    tmp = tempfile.TemporaryDirectory()
+    dead_letter_file = os.path.join(tmp.name, "dead_letter.jsonl")
+    pages = [Page(f"p{i}", f"P{i}", source_file=f"file{i}.pdf") for i in range(6)]
+
+    def run(items, **kwargs):
+        got = []
+        extract_with_bisection(items, lambda idx, person: got.append((idx, person.name)), **kwargs)
+        return got
+
+    try:
+        # A page that always fails the schema is isolated by bisection and dead-lettered;
+        # every other page keeps its position in the original batch
+        bad = pages[:3] + [Page("p-bad", "BAD page", source_file="bad.pdf")] + pages[3:]
+        got = run(bad)
+        assert sorted(got) == [(0, "P0"), (1, "P1"), (2, "P2"), (4, "P3"), (5, "P4"), (6, "P5")], got
+        assert dead_letter_ids == {"p-bad"} and load_dead_letter_ids(dead_letter_file) == {"p-bad"}
+        with open(dead_letter_file) as f:
+            entry = json.loads(f.readline())
+        assert entry["error_type"] == "MalformedResponse" and entry["source_file"] == "bad.pdf"
+
+        # A transport error is retried, then raised: nothing is bisected or dead-lettered
+        models.calls.clear()
+        models.down = True
+        try:
+            run(pages, max_attempts=3)
+            raise AssertionError("transport error was swallowed")
+        except ConnectionError:
+            pass
+        assert len(models.calls) == 3 and all(len(c) == len(pages) for c in models.calls), models.calls
+        assert load_dead_letter_ids(dead_letter_file) == {"p-bad"}
+        models.down = False
+
+        # A stream cut off after two people re-runs only the tail, without repeating anyone
+        models.calls.clear()
+        models.cut_after = 2
+        got = run(pages)
+        assert sorted(got) == [(i, f"P{i}") for i in range(6)], got
+        assert models.calls[1] == [f"P{i}" for i in range(1, 6)], models.calls
+    finally:
+        apiKey, client, prompt_cache, RESPONSE_CONFIG, STREAMING, dead_letter_file, time.sleep = saved
+        dead_letter_ids.clear()
+        tmp.cleanup()
+
+    print("extract self-check passed")
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--self-check"]:
+        _self_check()
+    else:
+        main()
@@ -1,10 +1,11 @@
-import json
 import csv
 import os
 import time
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from google import genai
+from .jsonl_codec import decode_page
+from .compressed_io import open_text
+from .context_cache import PromptCache, load_few_shot_examples, schema_instruction
 
 # 1. Define the Schema
 class CaseEvent(BaseModel):
@@ -28,7 +29,40 @@ class ExtractionResponse(BaseModel):
 apiKey = os.getenv("GEMINI_API_KEY", "")
 MODEL_ID = "gemini-3-flash-preview" 
 
-client = genai.Client(api_key=apiKey)
+# Created by init_client(); importing this module has no side effects
+client = None
+
+# Instruction, schema and few-shot pages are sent once as a context cache (see context_cache.py)
+SYSTEM_PROMPT = (
+    "You are a specialized historical researcher. Extract every individual from the following arrest warrant log text. "
+    "Pay attention to case IDs (###-####) and clerk shorthand for nationalities. "
+    "Ignore administrative staff unless they are the primary subject of a warrant."
+)
+USE_CONTEXT_CACHE = True
+CACHE_TTL_SECONDS = 3600
+# Same format as extract.py's file but with "LOG TEXT:" pages and no text_block_index
+FEW_SHOT_FILE = './data/few_shot_examples_single.jsonl'
+
+prompt_cache = None
+
+def init_client():
+    """
+    Creates the Gemini client and the prompt cache. Call once before extracting.
+    """
+    global client, prompt_cache
+    from google import genai
+
+    client = genai.Client(api_key=apiKey)
+    prompt_cache = PromptCache(
+        client.caches,
+        MODEL_ID,
+        SYSTEM_PROMPT,
+        examples=load_few_shot_examples(FEW_SHOT_FILE),
+        ttl_seconds=CACHE_TTL_SECONDS,
+        enabled=USE_CONTEXT_CACHE,
+        # The schema text rides along only in the cache; requests carry it as response_schema
+        cache_instruction=schema_instruction(SYSTEM_PROMPT, ExtractionResponse),
+    )
 
 def extract_structured_data(ocr_text):
     """
@@ -37,22 +71,17 @@ def extract_structured_data(ocr_text):
     if not apiKey:
         raise ValueError("API Key is missing. Please set the GEMINI_API_KEY environment variable.")
     
-    prompt = (
-        "You are a specialized historical researcher. Extract every individual from the following arrest warrant log text. "
-        "Pay attention to case IDs (###-####) and clerk shorthand for nationalities. "
-        "Ignore administrative staff unless they are the primary subject of a warrant.\n\n"
-        f"LOG TEXT:\n{ocr_text}"
-    )
+    prompt = f"LOG TEXT:\n{ocr_text}"
 
     for i in range(6):
         try:
-            response = client.models.generate_content(
-                model=MODEL_ID,
-                contents=prompt,
-                config={
+            response = prompt_cache.generate(
+                client.models,
+                {
                     "response_mime_type": "application/json",
                     "response_schema": ExtractionResponse.model_json_schema(),
                 },
+                prompt,
             )
             return ExtractionResponse.model_validate_json(response.text)
             
@@ -68,22 +97,32 @@ def extract_structured_data(ocr_text):
 # 3. Processing the Large JSONL File
 input_file = './data/test_json/test_25.jsonl'
 output_file = 'warrant_results.csv'
-all_records = []
+DUPLICATES_FILE = './data/near_duplicates.jsonl' # dedupe.DEFAULT_OUTPUT
+
+def run_extraction(input_file: str = input_file, output_file: str = output_file):
+    """
+    Extracts every page of input_file with one request per page and writes all
+    people to output_file at the end. Near-duplicate pages (see dedupe.py) are skipped.
+    """
+    from .dedupe import load_duplicates
+
+    all_records = []
+    duplicate_of, linked_source_files = load_duplicates(DUPLICATES_FILE, corpus_path=input_file)
 
-if not os.path.exists(input_file):
-    print(f"Error: File not found at {input_file}")
-else:
     print(f"Starting extraction from {input_file}...")
     
-    with open(input_file, 'r') as f:
+    with open_text(input_file, 'r') as f:
         for i, line in enumerate(f):
             if not line.strip(): continue
             
             try:
-                line_data = json.loads(line)
+                page = decode_page(line)
+                if page.id in duplicate_of:
+                    print(f"Skipping Entry {i+1} (near-duplicate of {duplicate_of[page.id]})")
+                    continue
                 # Pull source file directly from JSONL metadata (Loop Logic)
-                source_pdf = line_data.get('metadata', {}).get('Source-File', 'Unknown')
-                raw_text = line_data.get('text', '')
+                source_pdf = page.source_file
+                raw_text = page.text
                 
                 print(f"Processing Entry {i+1} (Source: {source_pdf})...")
                 
@@ -97,19 +136,23 @@ else:
                     # Assign metadata in the loop, ensuring 100% accuracy
                     record_dict['source_file'] = source_pdf
                     # Append raw JSON for troubleshooting as requested
-                    record_dict['raw_json_input'] = json.dumps(line_data)
+                    record_dict['raw_json_input'] = page.raw
+                    record_dict['duplicate_source_files'] = "; ".join(linked_source_files.get(page.id, []))
                     all_records.append(record_dict)
                     
             except Exception as e:
                 print(f"  !! Error on line {i+1}: {e}")
 
+    print(prompt_cache.summary())
+    prompt_cache.close()
+
     # 4. Save to CSV
     if all_records:
-        with open(output_file, 'w', newline='') as csvfile:
+        with open_text(output_file, 'w', newline='') as csvfile:
             fieldnames = [
                 'id', 'name', 'alias', 'location', 'nationality', 
                 'final_status', 'final_status_date', 'source_file', 
-                'chronology', 'raw_json_input'
+                'chronology', 'raw_json_input', 'duplicate_source_files'
             ]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -128,7 +171,25 @@ else:
                     'final_status_date': r['final_status_date'],
                     'source_file': r['source_file'],
                     'chronology': event_str,
-                    'raw_json_input': r['raw_json_input']
+                    'raw_json_input': r['raw_json_input'],
+                    'duplicate_source_files': r['duplicate_source_files']
                 })
         
-        print(f"\nFinished! Extracted {len(all_records)} total records to {output_file}")
\ No newline at end of file
+        print(f"\nFinished! Extracted {len(all_records)} total records to {output_file}")
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Extract people one page per request.")
+    ap.add_argument("--input", default=input_file)
+    ap.add_argument("--output", default=output_file)
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        print(f"Error: File not found at {args.input}")
+        return
+    init_client()
+    run_extraction(args.input, args.output)
+
+if __name__ == "__main__":
+    main()
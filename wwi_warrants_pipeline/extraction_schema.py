@@ -0,0 +1,28 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+# ----------------------------
+# Response schema for the batched Gemini extractor (extract.py)
+# ----------------------------
+#
+# Sent as response_schema with every request and used to validate what comes
+# back. Kept out of extract.py so the CLI can start without importing pydantic.
+
+class CaseEvent(BaseModel):
+    date: Optional[str] = Field(None, description="The date of the event (e.g., 7-29-18). Years are 1917-1921.")
+    action: str = Field(description="Summary of the event, e.g., Warrant issued, Recommendation sent")
+
+class PersonRecord(BaseModel):
+    # We add this field so the model can link the person back to the specific text block in the batch
+    text_block_index: int = Field(description="The index number (0, 1, 2...) of the text block where this individual was found.")
+    id: str = Field(description="Identifier of the individual, typically format ###-#### or ####. If unknown or missing, return 'Unknown'.")
+    name: str = Field(description="Full name of the individual")
+    alias: Optional[str] = Field(None, description="Alias or other names if mentioned")
+    location: Optional[str] = Field(None, description="City and State mentioned (e.g., St. Louis, Mo.)")
+    nationality: Optional[str] = Field(None, description="Nationality if listed (e.g., Ger, Austrian, gen)")
+    final_status: Optional[str] = Field("Unknown", description="Final disposition: e.g., Paroled, Insane, Released, To War")
+    final_status_date: Optional[str] = Field(None, description="The date the final status was reached. Use the context of preceding dates to determine the year if the dates are listed as MM-DD only.")
+    events: List[CaseEvent] = Field(default_factory=list, description="Chronological list of all events for this person")
+
+class ExtractionResponse(BaseModel):
+    people: List[PersonRecord]
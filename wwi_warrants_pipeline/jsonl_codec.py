@@ -0,0 +1,144 @@
+import json
+from typing import Any, Optional, Union
+
+# ----------------------------
+# Shared JSON(L) codec for every stage
+# ----------------------------
+#
+# One place to pick the fastest JSON backend that is installed:
+#   msgspec  - typed partial decoding of OCR pages + fast generic encode/decode
+#   orjson   - fast generic encode/decode
+#   json     - stdlib fallback, always available
+#
+# Most stages only need a page's `id`, `text` and metadata["Source-File"], so
+# `decode_page` decodes just those fields (msgspec skips the rest of the record
+# without building Python objects for it) and keeps the original line in
+# `page.raw`. Writers that need the full record (raw_json_input) reuse that
+# line instead of re-encoding the dict.
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if msgspec is not None:
+    BACKEND = "msgspec"
+elif orjson is not None:
+    BACKEND = "orjson"
+else:
+    BACKEND = "json"
+
+Text = Union[str, bytes, bytearray, memoryview]
+
+
+# ---- Generic encode / decode ----
+
+if msgspec is not None:
+    _decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+    def loads(data: Text) -> Any:
+        return _decoder.decode(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return _encoder.encode(obj)
+
+elif orjson is not None:
+
+    def loads(data: Text) -> Any:
+        return orjson.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+else:
+
+    def loads(data: Text) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8")
+        return json.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """
+    Compact single-line JSON (non-ASCII kept as UTF-8), suitable for a JSONL line.
+    """
+    return dumps_bytes(obj).decode("utf-8")
+
+
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else (ValueError,)
+
+
+# ---- Partial decode of OCR page records ----
+
+if msgspec is not None:
+
+    class _PageMetadata(msgspec.Struct):
+        source_file: Optional[str] = msgspec.field(name="Source-File", default="Unknown")
+        fallback_pages: Optional[int] = msgspec.field(name="total-fallback-pages", default=0)
+
+    class _PageFields(msgspec.Struct):
+        id: Optional[str] = ""
+        text: Optional[str] = ""
+        metadata: Optional[_PageMetadata] = None
+
+    _page_decoder = msgspec.json.Decoder(_PageFields)
+
+    def _decode_page_fields(data: Text):
+        fields = _page_decoder.decode(data)
+        metadata = fields.metadata or _PageMetadata()
+        return fields.id or "", fields.text or "", metadata.source_file or "Unknown", metadata.fallback_pages or 0
+
+else:
+
+    def _decode_page_fields(data: Text):
+        record = loads(data)
+        metadata = record.get("metadata") or {}
+        return (
+            record.get("id") or "",
+            record.get("text") or "",
+            metadata.get("Source-File") or "Unknown",
+            metadata.get("total-fallback-pages") or 0,
+        )
+
+
+class Page:
+    """
+    The fields of an olmOCR page record the pipeline actually uses, plus the
+    original JSONL line in `raw` (for raw_json_input and for passing through
+    records unchanged).
+    """
+
+    __slots__ = ("id", "text", "source_file", "fallback_pages", "raw")
+
+    def __init__(self, id: str, text: str, source_file: str = "Unknown", fallback_pages: int = 0, raw: str = ""):
+        self.id = id
+        self.text = text
+        self.source_file = source_file
+        self.fallback_pages = fallback_pages
+        self.raw = raw
+
+    def __repr__(self) -> str:
+        return f"Page(id={self.id!r}, source_file={self.source_file!r})"
+
+
+def decode_page(line: Text) -> Page:
+    """
+    Decodes one JSONL line into a Page without materialising the rest of the record.
+    Raises ValueError (or msgspec.DecodeError) on invalid JSON.
+    """
+    if isinstance(line, (bytes, bytearray, memoryview)):
+        raw = bytes(line).decode("utf-8")
+    else:
+        raw = line
+    raw = raw.rstrip("\r\n")
+    rec_id, text, source_file, fallback_pages = _decode_page_fields(raw)
+    return Page(rec_id, text, source_file, fallback_pages, raw)
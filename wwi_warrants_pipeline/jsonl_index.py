@@ -0,0 +1,374 @@
+import bisect
+import json
+import mmap
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .compressed_io import compression_for, decompress_frame, iter_frames
+from .jsonl_codec import DecodeError, Page, decode_page, loads
+
+# ----------------------------
+# Byte-offset index + memory-mapped reader for the JSONL corpora
+# ----------------------------
+#
+# A sidecar file (<name>.jsonl.idx.json) records the byte offset of every line
+# plus lookups from record `id`, metadata["Source-File"] and (volume, page) to
+# line numbers. It is built in one pass and rebuilt automatically when the
+# size or mtime of the JSONL no longer matches. The reader memory-maps the
+# JSONL so any record can be fetched without scanning from line 0.
+#
+# For .jsonl.gz / .jsonl.zst (see compressed_io.py) offsets are positions in
+# the decompressed stream and the index also lists every frame's compressed
+# offset, so a lookup decompresses only the frame holding that record.
+#
+# Lines that do not decode are listed in the index too ("invalid_lines"), and
+# iter_records / iter_pages print a warning for each one they skip, so a
+# corrupt line in the corpus is never dropped silently.
+
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".idx.json"
+
+# Same page pattern combine.py sorts on
+PAGE_RE = re.compile(r"page_(\d+)", re.IGNORECASE)
+
+
+def volume_page(source_file: str) -> Tuple[str, int]:
+    """
+    Splits a Source-File like "RG 60 Warrants Vol 1page_031.pdf" into
+    ("RG 60 Warrants Vol 1", 31). Page is -1 if there is no page suffix.
+    """
+    m = PAGE_RE.search(source_file)
+    page = int(m.group(1)) if m else -1
+    volume = PAGE_RE.sub("", source_file)
+    if volume.lower().endswith(".pdf"):
+        volume = volume[:-4]
+    return volume.strip(), page
+
+
+def index_path_for(jsonl_path: str) -> str:
+    return str(jsonl_path) + INDEX_SUFFIX
+
+
+def _file_signature(jsonl_path: str) -> Dict[str, int]:
+    st = os.stat(jsonl_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build_index(jsonl_path: str) -> dict:
+    """
+    Scans the JSONL once and returns the index dict (also written to the sidecar).
+    Line numbers count every physical line, blank or not, so they match the
+    `enumerate(f)` line numbers used by the checkpoint files.
+    """
+    offsets = []
+    frames = []  # [compressed_offset, compressed_length, decompressed_offset]
+    ids = {}
+    source_files = {}
+    pages = {}
+    invalid = []
+    pos = 0
+
+    def add_line(raw: bytes):
+        nonlocal pos
+        line_no = len(offsets)
+        offsets.append(pos)
+        pos += len(raw)
+        if not raw.strip():
+            return
+        try:
+            page = decode_page(raw)
+        except DecodeError:
+            invalid.append(line_no)
+            return
+        if page.id:
+            ids.setdefault(page.id, line_no)
+        sf = page.source_file
+        if sf and sf != "Unknown":
+            source_files.setdefault(sf, line_no)
+            volume, page_no = volume_page(sf)
+            pages.setdefault(volume, {}).setdefault(str(page_no), line_no)
+
+    kind = compression_for(jsonl_path)
+    if kind is None:
+        with open(jsonl_path, "rb") as f:
+            for raw in f:
+                add_line(raw)
+    else:
+        carry = b""
+        for comp_offset, comp_length, data in iter_frames(jsonl_path, kind):
+            frames.append([comp_offset, comp_length, pos + len(carry)])
+            lines = (carry + data).split(b"\n")
+            carry = lines.pop()
+            for line in lines:
+                add_line(line + b"\n")
+        if carry:
+            add_line(carry)
+    offsets.append(pos)  # end of file, so line n spans offsets[n]:offsets[n+1]
+
+    index = {
+        "version": INDEX_VERSION,
+        **_file_signature(jsonl_path),
+        "compression": kind,
+        "offsets": offsets,
+        "frames": frames,
+        "ids": ids,
+        "source_files": source_files,
+        "pages": pages,
+        "invalid_lines": invalid,
+    }
+
+    # Write atomically so a concurrent reader never sees half an index
+    idx_path = index_path_for(jsonl_path)
+    tmp_path = f"{idx_path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        json.dump(index, out)
+    os.replace(tmp_path, idx_path)
+    return index
+
+
+def load_index(jsonl_path: str, rebuild: bool = False) -> dict:
+    """
+    Returns the sidecar index, rebuilding it if missing, stale or from an older version.
+    """
+    idx_path = index_path_for(jsonl_path)
+    if not rebuild and os.path.exists(idx_path):
+        try:
+            with open(idx_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            sig = _file_signature(jsonl_path)
+            if (
+                index.get("version") == INDEX_VERSION
+                and index.get("size") == sig["size"]
+                and index.get("mtime_ns") == sig["mtime_ns"]
+            ):
+                return index
+        except (OSError, ValueError):
+            pass
+    return build_index(jsonl_path)
+
+
+class JsonlIndex:
+    """
+    Random access to a JSONL corpus through its sidecar index.
+
+        corpus = JsonlIndex("data/individual_narratives.jsonl")
+        corpus.get("a671da3f...")                      # by record id
+        corpus.by_source_file("RG 60 Warrants Vol 1page_031.pdf")
+        corpus.pages("RG 60 Warrants Vol 1", 31, 40)   # page range within a volume
+        for line_no, record in corpus.iter_records(start=1200): ...
+        corpus.slices(4)                               # (start, stop) line ranges for workers
+
+    Records are decoded on demand from a read-only mmap of the file (plain JSONL)
+    or from the one decompressed frame that holds them (.gz / .zst).
+    """
+
+    def __init__(self, jsonl_path: str, rebuild: bool = False):
+        self.path = str(jsonl_path)
+        self.index = load_index(self.path, rebuild=rebuild)
+        self.offsets: List[int] = self.index["offsets"]
+        self.compression = self.index.get("compression")
+        self.frames = self.index.get("frames", [])
+        self._frame_starts = [frame[2] for frame in self.frames]
+        self.invalid_lines = set(self.index.get("invalid_lines", []))
+        self._cached_frame = (None, b"")
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        """
+        Number of physical lines (including blank ones).
+        """
+        return max(len(self.offsets) - 1, 0)
+
+    # ---- Raw access ----
+
+    def raw_line(self, line_no: int) -> bytes:
+        start, end = self.offsets[line_no], self.offsets[line_no + 1]
+        if self.compression is None:
+            return self._mm[start:end]
+        return self._read_decompressed(start, end)
+
+    def _frame_data(self, k: int) -> bytes:
+        # Sequential reads hit the same frame many times in a row
+        if self._cached_frame[0] != k:
+            comp_offset, comp_length, _ = self.frames[k]
+            data = decompress_frame(self.compression, self._mm[comp_offset:comp_offset + comp_length])
+            self._cached_frame = (k, data)
+        return self._cached_frame[1]
+
+    def _read_decompressed(self, start: int, end: int) -> bytes:
+        k = bisect.bisect_right(self._frame_starts, start) - 1
+        parts = []
+        while start < end and k < len(self.frames):
+            frame_start = self.frames[k][2]
+            data = self._frame_data(k)
+            parts.append(data[start - frame_start:end - frame_start])
+            start = frame_start + len(data)
+            k += 1
+        return b"".join(parts)
+
+    def record(self, line_no: int) -> Optional[dict]:
+        """
+        Decoded record on line_no, or None for a blank/invalid line.
+        """
+        raw = self.raw_line(line_no)
+        if not raw.strip():
+            return None
+        try:
+            return loads(raw)
+        except DecodeError:
+            return None
+
+    def page_at(self, line_no: int) -> Optional[Page]:
+        """
+        Just the id/text/Source-File of line_no (plus the raw line), or None for a
+        blank/invalid line. Cheaper than record() when the full dict is not needed.
+        """
+        raw = self.raw_line(line_no)
+        if not raw.strip():
+            return None
+        try:
+            return decode_page(raw)
+        except DecodeError:
+            return None
+
+    # ---- Keyed lookups ----
+
+    def line_of(self, rec_id: str) -> Optional[int]:
+        return self.index["ids"].get(rec_id)
+
+    def get(self, rec_id: str) -> Optional[dict]:
+        line_no = self.line_of(rec_id)
+        return None if line_no is None else self.record(line_no)
+
+    def get_page(self, rec_id: str) -> Optional[Page]:
+        line_no = self.line_of(rec_id)
+        return None if line_no is None else self.page_at(line_no)
+
+    def by_source_file(self, source_file: str) -> Optional[dict]:
+        line_no = self.index["source_files"].get(source_file)
+        return None if line_no is None else self.record(line_no)
+
+    def volumes(self) -> List[str]:
+        return sorted(self.index["pages"])
+
+    def page(self, volume: str, page: int) -> Optional[dict]:
+        line_no = self.index["pages"].get(volume, {}).get(str(page))
+        return None if line_no is None else self.record(line_no)
+
+    def pages(self, volume: str, first: int, last: int) -> List[dict]:
+        """
+        Records for pages first..last (inclusive) of a volume, in page order.
+        Missing pages are skipped.
+        """
+        vol_pages = self.index["pages"].get(volume, {})
+        out = []
+        for page in range(first, last + 1):
+            line_no = vol_pages.get(str(page))
+            if line_no is not None:
+                out.append(self.record(line_no))
+        return out
+
+    # ---- Sequential / parallel access ----
+
+    def _skipped(self, line_no: int):
+        if line_no in self.invalid_lines:
+            print(f"  !! {self.path} line {line_no + 1} is not a valid record; skipped")
+
+    def iter_records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, dict]]:
+        """
+        Yields (line_no, record) for lines start..stop-1, skipping blank lines and
+        (with a warning) invalid ones. Resuming from a checkpoint seeks straight to `start`.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for line_no in range(start, stop):
+            record = self.record(line_no)
+            if record is not None:
+                yield line_no, record
+            else:
+                self._skipped(line_no)
+
+    def iter_pages(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Page]]:
+        """
+        Like iter_records but yields (line_no, Page) with only the fields stages use.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for line_no in range(start, stop):
+            page = self.page_at(line_no)
+            if page is not None:
+                yield line_no, page
+            else:
+                self._skipped(line_no)
+
+    def slices(self, n: int) -> List[Tuple[int, int]]:
+        """
+        Splits the file into n contiguous (start, stop) line ranges of roughly equal
+        byte size, for handing to parallel workers.
+        """
+        total_lines = len(self)
+        if total_lines == 0 or n <= 1:
+            return [(0, total_lines)]
+        total_bytes = self.offsets[-1]
+        bounds = [0]
+        line_no = 0
+        for k in range(1, n):
+            target = total_bytes * k // n
+            while line_no < total_lines and self.offsets[line_no] < target:
+                line_no += 1
+            if line_no > bounds[-1]:
+                bounds.append(line_no)
+        bounds.append(total_lines)
+        return [(bounds[k], bounds[k + 1]) for k in range(len(bounds) - 1) if bounds[k] < bounds[k + 1]]
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants index", description="Build or query the byte-offset index of a JSONL corpus.")
+    ap.add_argument("jsonl_path")
+    ap.add_argument("--rebuild", action="store_true", help="Force a rebuild of the sidecar index")
+    ap.add_argument("--id", help="Print the record with this id")
+    ap.add_argument("--source-file", help="Print the record for this Source-File")
+    ap.add_argument("--line", type=int, help="Print the record on this line number")
+    ap.add_argument("--pages", nargs=3, metavar=("VOLUME", "FIRST", "LAST"), help='e.g. --pages "RG 60 Warrants Vol 1" 31 35')
+    ap.add_argument("--slices", type=int, help="Print N line ranges for parallel workers")
+    args = ap.parse_args(argv)
+
+    with JsonlIndex(args.jsonl_path, rebuild=args.rebuild) as corpus:
+        results = []
+        if args.id:
+            results.append(corpus.get(args.id))
+        if args.source_file:
+            results.append(corpus.by_source_file(args.source_file))
+        if args.line is not None:
+            results.append(corpus.record(args.line))
+        if args.pages:
+            volume, first, last = args.pages
+            results.extend(corpus.pages(volume, int(first), int(last)))
+        for r in results:
+            print(json.dumps(r, ensure_ascii=False))
+        if args.slices:
+            for start, stop in corpus.slices(args.slices):
+                print(f"{start}\t{stop}")
+        if not (results or args.slices):
+            print(f"Indexed {len(corpus)} lines, {len(corpus.index['ids'])} ids, volumes: {', '.join(corpus.volumes())}")
+            if corpus.invalid_lines:
+                lines = ", ".join(str(n + 1) for n in sorted(corpus.invalid_lines))
+                print(f"  !! {len(corpus.invalid_lines)} lines are not valid records: {lines}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+import glob
+from typing import List, Optional
+
+# --- Configuration ---
+# The API key is read from the environment (or --api-key), never from this file.
+# Folders default to the environment too so each machine can set its own.
+API_KEY_ENV = "CIRRASCALE_API_KEY"
+INPUT_DIR_ENV = "WARRANTS_PDF_DIR"
+WORKSPACE_ENV = "WARRANTS_OCR_WORKSPACE"
+model_name = "olmOCR-2-7B-1025"
+server_url = "https://ai2endpoints.cirrascale.ai/api"
+
+SAMPLE_SIZE = 15
+
+def run_olmocr_pipeline(input_pdf_folder: str, workspace_folder: str, api_key: str,
+                        model: str = model_name, server: str = server_url, dry_run: bool = False) -> bool:
+    """
+    Runs the hosted olmOCR pipeline over every PDF in input_pdf_folder, writing
+    JSONL and markdown into workspace_folder. Returns True on success.
+    """
+    # 1. Validation
+    if not api_key:
+        print(f"Error: no API key. Set {API_KEY_ENV} or pass --api-key.")
+        return False
+    if not os.path.exists(input_pdf_folder):
+        print(f"Error: SSD not found at {input_pdf_folder}")
+        return False
+
+    # 2. Run from inside the PDF folder
+    # Listing the manifest by filename (relative to the folder) is what prevents
+    # olmOCR from recreating the full input path inside the workspace
+    pdf_files = sorted(os.path.basename(p) for p in glob.glob(os.path.join(input_pdf_folder, "*.pdf")))
+
+    if not pdf_files:
+        print(f"No PDFs found in {input_pdf_folder}")
+        return False
+
+    if dry_run:
+        pdf_files = pdf_files[:SAMPLE_SIZE]
+
+    # 3. Create manifest with FILENAMES ONLY
+    # We save the manifest inside the input folder temporarily
+    manifest_name = "pdf_manifest.txt"
+    manifest_path = os.path.join(input_pdf_folder, manifest_name)
+    with open(manifest_path, "w") as f:
+        for pdf_name in pdf_files:
+            f.write(pdf_name + "\n")
+
+    print(f"Created manifest with {len(pdf_files)} files.")
+
+    # 4. Build the command
+    # Note: we use the absolute path for workspace_folder so it knows where to send results
+    command = [
+        sys.executable, "-m", "olmocr.pipeline",
+        os.path.abspath(workspace_folder),
+        "--server", server,
+        "--api_key", api_key,
+        "--model", model,
+        "--pdfs", manifest_name,
+        "--markdown",
+        "--pages_per_group", "5"
+    ]
+
+    print(f"Starting olmOCR pipeline from the SSD root...")
+
+    try:
+        # Running the command while CWD is the input folder
+        subprocess.run(command, check=True, cwd = input_pdf_folder)
+        print(f"\nSuccess! Check {workspace_folder}/markdown/")
+        return True
+    except subprocess.CalledProcessError as e:
+        # The command line holds the key; report only the exit status
+        print(f"\nError: olmOCR pipeline exited with status {e.returncode}")
+        return False
+    finally:
+        # Cleanup
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants ocr", description="Run the separated page PDFs through hosted olmOCR.")
+    ap.add_argument("--input-dir", default=os.getenv(INPUT_DIR_ENV), help=f"Folder of single-page PDFs (default: ${INPUT_DIR_ENV})")
+    ap.add_argument("--workspace", default=os.getenv(WORKSPACE_ENV), help=f"olmOCR output folder (default: ${WORKSPACE_ENV})")
+    ap.add_argument("--api-key", default=os.getenv(API_KEY_ENV), help=f"Default: ${API_KEY_ENV}")
+    ap.add_argument("--model", default=model_name)
+    ap.add_argument("--server", default=server_url)
+    ap.add_argument("--dry-run", action="store_true", help=f"Only run the first {SAMPLE_SIZE} PDFs")
+    args = ap.parse_args(argv)
+
+    if not args.input_dir or not args.workspace:
+        ap.error(f"--input-dir and --workspace are required (or set ${INPUT_DIR_ENV} / ${WORKSPACE_ENV})")
+
+    ok = run_olmocr_pipeline(args.input_dir, args.workspace, args.api_key, args.model, args.server, args.dry_run)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import json
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from .compressed_io import open_text
+from .jsonl_index import JsonlIndex
 
 # ----------------------------
 # Regexes tuned to RG 60
@@ -55,14 +58,18 @@ def looks_like_person_start(lines: List[str], idx: int) -> bool:
 # Main segmentation
 # ----------------------------
 
-def segment_people_from_jsonl(jsonl_path: str) -> List[Dict]:
+def segment_people_from_jsonl(jsonl_path: str, start_line: int = 0, stop_line: Optional[int] = None) -> List[Dict]:
+    """
+    Segments pages start_line..stop_line-1 (default: the whole file). The range is
+    read through the byte-offset index, so parallel workers can each take a slice
+    from JsonlIndex.slices() without scanning the lines before it.
+    """
     people = []
     person_index = 0
 
-    with open(jsonl_path, "r") as f:
-        for page_idx, raw in enumerate(f):
-            record = json.loads(raw)
-            text = record.get("text", "")
+    with JsonlIndex(jsonl_path) as corpus:
+        for page_idx, page in corpus.iter_pages(start=start_line, stop=stop_line):
+            text = page.text
             lines = [l.rstrip() for l in text.splitlines() if l.strip()]
 
             current = []
@@ -99,21 +106,21 @@ def segment_people_from_jsonl(jsonl_path: str) -> List[Dict]:
 
     return people
 
-if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) != 2:
-        print("Usage: python segment_rg60.py <path_to_jsonl>")
-        sys.exit(1)
+def main(argv: Optional[List[str]] = None):
+    import argparse
 
-    jsonl_path = sys.argv[1]
+    ap = argparse.ArgumentParser(prog="wwi-warrants segment", description="Split each page into per-person text blocks with regexes.")
+    ap.add_argument("jsonl_path")
+    ap.add_argument("--output", default="segmented_people.json", help="Name it .json.gz / .json.zst to write it compressed")
+    ap.add_argument("--preview", type=int, default=20, help="Number of blocks to print")
+    args = ap.parse_args(argv)
 
-    segments = segment_people_from_jsonl(jsonl_path)
+    segments = segment_people_from_jsonl(args.jsonl_path)
 
     print(f"\nExtracted {len(segments)} person blocks\n")
 
-    # Print a preview of first 5 segments
-    for seg in segments[:20]:
+    # Print a preview of the first segments
+    for seg in segments[:args.preview]:
         print("=" * 60)
         print(f"Person index: {seg['person_index']}")
         print(f"ID candidates: {seg['id_candidates']}")
@@ -121,12 +128,14 @@ if __name__ == "__main__":
         print("TEXT PREVIEW:")
         print(seg["raw_text"][:500], "...\n")
 
+    print("\nBlocks missing names:")
+    for seg in segments:
+        if not seg["name_candidates"]:
+            print(f"⚠️ Person {seg['person_index']} | IDs: {seg['id_candidates']}")
 
-print("\nBlocks missing names:")
-for seg in segments:
-    if not seg["name_candidates"]:
-        print(f"⚠️ Person {seg['person_index']} | IDs: {seg['id_candidates']}")
+    with open_text(args.output, "w") as out:
+        json.dump(segments, out, indent=2)
 
 
-with open("segmented_people.json", "w") as out:
-    json.dump(segments, out, indent=2)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import glob
+import os
+from typing import List, Optional
+
+# ----------------------------
+# Split the scanned volume PDFs into one PDF per page
+# ----------------------------
+#
+# Python version of pdf_split.R, so the whole pipeline runs from one CLI.
+# Output names match the R script ("RG 60 Warrants Vol 1page_031.pdf"),
+# which is the Source-File that olmOCR records and every later stage parses.
+# Needs the optional `pypdf` package.
+
+INPUT_DIR_ENV = "WARRANTS_VOLUME_DIR"
+OUTPUT_DIR_ENV = "WARRANTS_PDF_DIR"
+
+
+def split_pdf_to_pages(input_file: str, output_dir: str) -> int:
+    """
+    Writes each page of input_file to output_dir as <name>page_NNN.pdf.
+    Returns the number of pages written.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise ImportError("Splitting PDFs needs the 'pypdf' package (pip install pypdf).")
+
+    reader = PdfReader(input_file)
+    total_pages = len(reader.pages)
+    print(f"Processing: {input_file}")
+    print(f"Total pages to split: {total_pages}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    short_name = os.path.splitext(os.path.basename(input_file))[0]
+    for i, page in enumerate(reader.pages, start=1):
+        output_filename = os.path.join(output_dir, f"{short_name}page_{i:03d}.pdf")
+        writer = PdfWriter()
+        writer.add_page(page)
+        with open(output_filename, "wb") as out:
+            writer.write(out)
+
+    print(f"Done! {total_pages} pages separated.")
+    return total_pages
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants split", description="Split volume PDFs into single-page PDFs.")
+    ap.add_argument("pdfs", nargs="*", help=f"Volume PDFs (default: every PDF in ${INPUT_DIR_ENV})")
+    ap.add_argument("--output-dir", default=os.getenv(OUTPUT_DIR_ENV), help=f"Default: ${OUTPUT_DIR_ENV}")
+    args = ap.parse_args(argv)
+
+    pdfs = args.pdfs
+    if not pdfs and os.getenv(INPUT_DIR_ENV):
+        pdfs = sorted(glob.glob(os.path.join(os.environ[INPUT_DIR_ENV], "*.pdf")))
+    if not pdfs:
+        ap.error(f"no input PDFs (pass them or set ${INPUT_DIR_ENV})")
+    if not args.output_dir:
+        ap.error(f"--output-dir is required (or set ${OUTPUT_DIR_ENV})")
+
+    for pdf in pdfs:
+        split_pdf_to_pages(pdf, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
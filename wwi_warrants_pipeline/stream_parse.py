@@ -0,0 +1,133 @@
+import json
+from typing import List
+
+from .jsonl_codec import loads
+
+# ----------------------------
+# Incremental parser for streamed {"people": [...]} responses
+# ----------------------------
+#
+# The structured-output responses are a single object with a "people" array.
+# When the body is streamed we do not want to wait for the closing brace: each
+# element of "people" is handed back as soon as its own closing "}" arrives,
+# so it can be validated and written while the model is still generating the
+# rest. If the stream is cut off, everything returned so far is complete.
+
+
+class PeopleStreamParser:
+    """
+    Feed text chunks in order; `feed` returns the person dicts completed by that chunk.
+
+    Only the characters needed to track strings, escapes and nesting are inspected,
+    and text before the current element is discarded, so memory stays bounded by
+    the size of one person object.
+    """
+
+    def __init__(self, array_key: str = "people"):
+        self.array_key = array_key
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None
+        self.in_array = False
+        self.item_start = None
+        self.done = False
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[dict]:
+        items = []
+        self.buf += chunk
+        buf = self.buf
+        i = self.pos
+
+        while i < len(buf):
+            c = buf[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    # Keys of the root object sit at depth 1
+                    if self.depth == 1 and not self.in_array:
+                        self.last_key = buf[self.string_start + 1:i]
+                i += 1
+                continue
+
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c in "{[":
+                if c == "[" and self.depth == 1 and self.last_key == self.array_key:
+                    self.in_array = True
+                elif c == "{" and self.in_array and self.depth == 2:
+                    self.item_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if c == "}" and self.in_array and self.depth == 2 and self.item_start is not None:
+                    items.append(loads(buf[self.item_start:i + 1]))
+                    self.emitted += 1
+                    self.item_start = None
+                elif c == "]" and self.in_array and self.depth == 1:
+                    self.in_array = False
+                elif self.depth == 0:
+                    self.done = True
+            i += 1
+
+        # Drop everything already consumed unless we are inside an element
+        keep_from = self.item_start if self.item_start is not None else i
+        if self.in_string and self.item_start is None and self.string_start is not None:
+            keep_from = min(keep_from, self.string_start)
+        self.buf = buf[keep_from:]
+        self.pos = i - keep_from
+        if self.item_start is not None:
+            self.item_start -= keep_from
+        if self.string_start is not None:
+            self.string_start -= keep_from
+        return items
+
+    @property
+    def complete(self) -> bool:
+        """
+        True once the root object has been closed, i.e. the response was not truncated.
+        """
+        return self.done
+
+
+class StreamTruncated(Exception):
+    """
+    Raised when a streamed response ends (or errors) before the root object closes.
+    `completed` is the number of people that were fully received before the cut.
+    """
+
+    def __init__(self, completed: int, cause: Exception = None):
+        self.completed = completed
+        self.cause = cause
+        super().__init__(f"Stream cut off after {completed} complete people: {cause}")
+
+
+if __name__ == "__main__":
+    # Quick self-check: feed a response in awkward pieces and cut it short
+    body = json.dumps({"people": [
+        {"text_block_index": 0, "id": "1083-1047-2", "name": "William F. Streifert", "events": [{"date": "7-25-18", "action": "Warrant issued {\"x\"}"}]},
+        {"text_block_index": 0, "id": "1084-5837", "name": "Carl Winterlin", "events": []},
+        {"text_block_index": 1, "id": "1085-58242", "name": "Ludwig Henry Hauschen", "events": []},
+    ]})
+    for size in (1, 3, 7, len(body)):
+        parser = PeopleStreamParser()
+        got = []
+        for k in range(0, len(body), size):
+            got.extend(parser.feed(body[k:k + size]))
+        assert [p["name"] for p in got] == ["William F. Streifert", "Carl Winterlin", "Ludwig Henry Hauschen"], got
+        assert parser.complete
+
+    parser = PeopleStreamParser()
+    got = parser.feed(body[: body.index("Ludwig")])
+    assert len(got) == 2 and not parser.complete
+    print("stream_parse self-check passed")
@@ -0,0 +1,443 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .compressed_io import open_text
+from .jsonl_codec import dumps, loads
+from .jsonl_index import JsonlIndex
+
+# ----------------------------
+# Lease-based work queue for running extraction on several workers
+# ----------------------------
+#
+# The archive is cut into units (a list of record ids, one extraction batch
+# each) stored in a single SQLite file. Any number of worker processes, on one
+# machine or several machines sharing the file, take a unit by leasing it for
+# a fixed time, keep the lease alive with heartbeats while the model runs, and
+# commit the unit's output rows in the same transaction that marks it done.
+# A worker that dies stops heartbeating; its lease expires and the next
+# worker to ask picks the unit up again. A commit from a worker that has lost
+# its lease is refused, so each unit's rows are stored exactly once.
+#
+# A unit whose batch kills its worker every time (or keeps timing out) would
+# otherwise be re-leased forever. After max_attempts leases it is set to
+# 'failed' instead; `wwi-warrants queue retry` puts failed units back.
+#
+# SQLite locking needs a filesystem with working POSIX locks (local disk or a
+# properly configured NFS/SMB share). No other coordination service is used.
+# The database uses SQLite's default rollback journal, which is what a file
+# shared between machines needs: WAL mode keeps its index in shared memory,
+# so it only works when every worker is on the same host, and on a network
+# filesystem it can corrupt the database. For a queue that only one host's
+# workers use, `queue enqueue --single-host` switches the file to WAL (less
+# lock contention). The mode is stored in the database file itself.
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit_id       INTEGER PRIMARY KEY,
+    record_ids    TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    lease_owner   TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    updated       REAL
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    unit_id INTEGER NOT NULL,
+    seq     INTEGER NOT NULL,
+    row     TEXT NOT NULL,
+    PRIMARY KEY (unit_id, seq)
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    One connection to the queue database. Not shared between threads; the
+    heartbeat thread opens its own.
+    """
+
+    def __init__(self, db_path: str, single_host: bool = False):
+        """
+        single_host=True switches the database to WAL mode; only do this when
+        every worker runs on this machine (see the module comment).
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        if single_host:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        if self.conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # Durable at each checkpoint in WAL mode; the rollback journal keeps FULL
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_txn(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never
+        # read the same pending unit and both lease it
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    # ---- Producer side ----
+
+    def enqueue(self, batches: List[List[str]]) -> int:
+        """
+        Adds one unit per batch of record ids. Ids already in a unit are skipped,
+        so re-running the enqueue step after new pages arrive only adds the new ones.
+        """
+        self._write_txn()
+        try:
+            known = set()
+            for (ids_json,) in self.conn.execute("SELECT record_ids FROM units"):
+                known.update(loads(ids_json))
+            added = 0
+            now = time.time()
+            for batch in batches:
+                batch = [rec_id for rec_id in batch if rec_id not in known]
+                if not batch:
+                    continue
+                self.conn.execute(
+                    "INSERT INTO units (record_ids, updated) VALUES (?, ?)",
+                    (dumps(batch), now),
+                )
+                known.update(batch)
+                added += 1
+            self.conn.execute("COMMIT")
+            return added
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def enqueue_jsonl(self, corpus_path: str, batch_size: int, skip_ids: Optional[set] = None) -> int:
+        """
+        Cuts a JSONL corpus into units of batch_size record ids, in file order.
+        Ids in skip_ids (e.g. near-duplicate pages) are left out.
+        """
+        batches, current = [], []
+        with JsonlIndex(corpus_path) as corpus:
+            for _, page in corpus.iter_pages():
+                if skip_ids and page.id in skip_ids:
+                    continue
+                current.append(page.id)
+                if len(current) >= batch_size:
+                    batches.append(current)
+                    current = []
+        if current:
+            batches.append(current)
+        return self.enqueue(batches)
+
+    # ---- Worker side ----
+
+    def lease(
+        self,
+        worker_id: str,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> Optional[Tuple[int, List[str]]]:
+        """
+        Leases the oldest pending unit, or one whose lease has expired (its worker
+        stopped heartbeating). Units that have already been leased max_attempts
+        times are marked 'failed' instead. Returns (unit_id, record_ids) or None
+        when the queue is drained.
+        """
+        now = time.time()
+        self._write_txn()
+        try:
+            cur = self.conn.execute(
+                """
+                UPDATE units SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE attempts >= ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                """,
+                (now, max_attempts, now),
+            )
+            if cur.rowcount > 0:
+                print(f"  !! {cur.rowcount} unit(s) failed after {max_attempts} attempts")
+            row = self.conn.execute(
+                """
+                SELECT unit_id, record_ids FROM units
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ?
+                ORDER BY unit_id LIMIT 1
+                """,
+                (now, max_attempts),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            unit_id, ids_json = row
+            self.conn.execute(
+                """
+                UPDATE units SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                 attempts = attempts + 1, updated = ?
+                WHERE unit_id = ?
+                """,
+                (worker_id, now + lease_seconds, now, unit_id),
+            )
+            self.conn.execute("COMMIT")
+            return unit_id, loads(ids_json)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self, unit_id: int, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+        """
+        Extends the lease. Returns False if this worker no longer holds it.
+        """
+        now = time.time()
+        cur = self.conn.execute(
+            """
+            UPDATE units SET lease_expires = ?, updated = ?
+            WHERE unit_id = ? AND status = 'leased' AND lease_owner = ?
+            """,
+            (now + lease_seconds, now, unit_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, unit_id: int, worker_id: str, rows: List[Dict]) -> bool:
+        """
+        Stores the unit's rows and marks it done in one transaction. Refused
+        (returns False, nothing written) if the lease was lost to another worker.
+        """
+        now = time.time()
+        self._write_txn()
+        try:
+            cur = self.conn.execute(
+                """
+                UPDATE units SET status = 'done', lease_expires = NULL, updated = ?
+                WHERE unit_id = ? AND status = 'leased' AND lease_owner = ?
+                """,
+                (now, unit_id, worker_id),
+            )
+            if cur.rowcount != 1:
+                self.conn.execute("ROLLBACK")
+                return False
+            self.conn.executemany(
+                "INSERT INTO results (unit_id, seq, row) VALUES (?, ?, ?)",
+                [(unit_id, seq, dumps(row)) for seq, row in enumerate(rows)],
+            )
+            self.conn.execute("COMMIT")
+            return True
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def release(self, unit_id: int, worker_id: str):
+        """
+        Gives a unit back without results (the worker is shutting down, or the
+        model API is failing). The lease does not count as an attempt, so an
+        outage does not push units towards 'failed'.
+        """
+        self.conn.execute(
+            """
+            UPDATE units SET status = 'pending', lease_owner = NULL, lease_expires = NULL,
+                             attempts = MAX(attempts - 1, 0), updated = ?
+            WHERE unit_id = ? AND status = 'leased' AND lease_owner = ?
+            """,
+            (time.time(), unit_id, worker_id),
+        )
+
+    def retry_failed(self) -> int:
+        """
+        Puts failed units back to pending with a fresh attempt count.
+        """
+        cur = self.conn.execute(
+            "UPDATE units SET status = 'pending', attempts = 0, updated = ? WHERE status = 'failed'",
+            (time.time(),),
+        )
+        return cur.rowcount
+
+    # ---- Reporting ----
+
+    def progress(self) -> Dict[str, int]:
+        counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+        now = time.time()
+        for status, expires in self.conn.execute("SELECT status, lease_expires FROM units"):
+            if status == "leased" and expires is not None and expires < now:
+                counts["expired"] += 1
+            else:
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def iter_results(self):
+        for (row_json,) in self.conn.execute("SELECT row FROM results ORDER BY unit_id, seq"):
+            yield loads(row_json)
+
+    def export_csv(self, output_csv: str, fieldnames: Optional[List[str]] = None) -> int:
+        import csv
+
+        count = 0
+        with open_text(output_csv, "w", newline="") as f:
+            writer = None
+            for row in self.iter_results():
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=fieldnames or list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+class Heartbeat:
+    """
+    Keeps a unit's lease alive from a background thread while the batch runs.
+    `lost` is set if the lease was taken over (the result will then be discarded).
+
+        with Heartbeat(db_path, unit_id, worker_id) as hb:
+            rows = run_batch(...)
+        if not hb.lost: queue.complete(...)
+    """
+
+    def __init__(self, db_path: str, unit_id: int, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        self.db_path = db_path
+        self.unit_id = unit_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = WorkQueue(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                try:
+                    if not queue.heartbeat(self.unit_id, self.worker_id, self.lease_seconds):
+                        self.lost = True
+                        return
+                except sqlite3.OperationalError as e:
+                    # Busy database; the next beat is still well inside the lease
+                    print(f"  !! Heartbeat for unit {self.unit_id} failed: {e}")
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="wwi-warrants queue", description="Manage the extraction work queue.")
+    ap.add_argument("--db", default="./data/work_queue.sqlite")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_init = sub.add_parser("enqueue", help="Cut a JSONL corpus into units of record ids")
+    p_init.add_argument("--corpus", default="./data/individual_narratives.jsonl")
+    p_init.add_argument("--batch-size", type=int, default=10)
+    p_init.add_argument("--duplicates", default="./data/near_duplicates.jsonl", help="Leave out pages listed as near-duplicates (if the file exists)")
+    p_init.add_argument("--single-host", action="store_true", help="Use WAL mode; only when all workers run on this machine (never on a network share)")
+
+    sub.add_parser("status", help="Show unit counts by state")
+    sub.add_parser("retry", help="Put failed units back in the queue")
+
+    p_export = sub.add_parser("export", help="Write all committed rows to a CSV")
+    p_export.add_argument("--output", default="warrant_results_queue.csv")
+
+    args = ap.parse_args(argv)
+    with WorkQueue(args.db, single_host=getattr(args, "single_host", False)) as queue:
+        if args.command == "enqueue":
+            from .dedupe import load_duplicates
+
+            duplicate_of, _ = load_duplicates(args.duplicates, corpus_path=args.corpus)
+            added = queue.enqueue_jsonl(args.corpus, args.batch_size, skip_ids=set(duplicate_of))
+            print(f"Added {added} units to {args.db}")
+        elif args.command == "status":
+            print(", ".join(f"{k}: {v}" for k, v in queue.progress().items()))
+        elif args.command == "retry":
+            print(f"Requeued {queue.retry_failed()} failed units")
+        elif args.command == "export":
+            count = queue.export_csv(args.output)
+            print(f"Exported {count} rows to {args.output}")
+
+
+def _self_check():
+    """
+    Lease/heartbeat/complete on a throwaway database, with short leases.
+    Run with `python -m wwi_warrants_pipeline.work_queue --self-check`.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "queue.sqlite")
+        with WorkQueue(db) as a, WorkQueue(db) as b:
+            # The shared-file default is the rollback journal
+            assert a.conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "delete"
+
+            # Re-enqueueing skips ids that are already in a unit
+            assert a.enqueue([["p0", "p1"], ["p2", "p3"]]) == 2
+            assert a.enqueue([["p2", "p3"], ["p1"]]) == 0
+
+            # Two workers never hold the same unit
+            unit_a, ids_a = a.lease("worker-a", lease_seconds=60)
+            unit_b, ids_b = b.lease("worker-b", lease_seconds=60)
+            assert (ids_a, ids_b) == (["p0", "p1"], ["p2", "p3"])
+            assert a.heartbeat(unit_a, "worker-a") and not a.heartbeat(unit_a, "worker-b")
+            assert a.complete(unit_a, "worker-a", [{"id": "p0"}, {"id": "p1"}])
+            assert not a.complete(unit_a, "worker-a", [{"id": "p0"}])
+
+            # Released on shutdown: pending again, and the lease does not count as an attempt
+            b.release(unit_b, "worker-b")
+            assert b.conn.execute("SELECT status, attempts FROM units WHERE unit_id = ?", (unit_b,)).fetchone() == ("pending", 0)
+
+            # A heartbeat keeps the lease past its original expiry
+            unit_b, _ = b.lease("worker-b", lease_seconds=0.6)
+            with Heartbeat(db, unit_b, "worker-b", lease_seconds=0.6) as hb:
+                time.sleep(1.0)
+                assert a.lease("worker-a", lease_seconds=60) is None
+            assert not hb.lost
+
+            # Without heartbeats the lease expires and another worker takes the unit over;
+            # the old owner's commit is then refused and the rows are stored once
+            assert not b.heartbeat(unit_b, "worker-a")
+            b.conn.execute("UPDATE units SET lease_expires = ? WHERE unit_id = ?", (time.time() - 1, unit_b))
+            taken, _ = a.lease("worker-a", lease_seconds=60)
+            assert taken == unit_b
+            assert not b.heartbeat(unit_b, "worker-b")
+            assert not b.complete(unit_b, "worker-b", [{"id": "p2", "by": "worker-b"}])
+            assert a.complete(unit_b, "worker-a", [{"id": "p2", "by": "worker-a"}])
+            assert [row["by"] for row in a.iter_results() if row["id"] == "p2"] == ["worker-a"]
+
+            # A unit whose worker keeps dying is failed after max_attempts, and `retry` brings it back
+            assert a.enqueue([["p3", "p4"]]) == 1
+            for _ in range(2):
+                unit_c, _ = a.lease("worker-a", lease_seconds=0, max_attempts=2)
+                time.sleep(0.01)
+            assert a.lease("worker-a", max_attempts=2) is None
+            assert a.progress()["failed"] == 1
+            assert a.retry_failed() == 1 and a.lease("worker-a", max_attempts=2)[0] == unit_c
+
+        with WorkQueue(db, single_host=True) as c:
+            assert c.conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+
+    print("work_queue self-check passed")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--self-check"]:
+        _self_check()
+    else:
+        main()